@@ -1,539 +1,895 @@
-import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import numpy as np
-import time
-import io
-import openpyxl
-
-
-
-st.header('レッスン14: エクスパンダーとサイドバーによるレイアウト')
-st.subheader("エクスパンダーの使⽤例")
-# 1年分のデータを⽣成
-sales_data = pd.DataFrame({
-    '⽇付': pd.date_range(start='2023-01-01', end='2023-12-31'),
-    '売上': np.random.randint(1000, 5000, 365),
-    '商品': np.random.choice(['A', 'B', 'C'], 365)
-})
-with st.expander("データセットの詳細を表⽰"):
-    st.dataframe(sales_data)
-with st.expander("グラフを表⽰"):
-    fig = go.Figure(data=go.Scatter(x=sales_data['⽇付'], y=sales_data['売上'], mode='lines+markers'))
-    fig.update_layout(title='⽇別売上推移')
-    st.plotly_chart(fig)
-with st.expander("統計情報"):
-    st.write(f"総売上: {sales_data['売上'].sum():,}円")
-    st.write(f"平均売上: {sales_data['売上'].mean():.2f}円")
-    st.write(f"最⾼売上: {sales_data['売上'].max():,}円")
-    st.write(f"最低売上: {sales_data['売上'].min():,}円")
-
-
-st.subheader("サイドバーの使⽤例")
-st.sidebar.title("データ分析ツール")
-analysis_option = st.sidebar.radio("分析オプション", ("データ概要", "売上分析", "商品別分析"))
-date_range = st.sidebar.date_input(
-    "⽇付範囲",
-    value=(sales_data['⽇付'].min().date(), sales_data['⽇付'].max().date())
-)
-filtered_data = sales_data[(sales_data['⽇付'].dt.date >= date_range[0]) &
-                           (sales_data['⽇付'].dt.date <= date_range[1])]
-if filtered_data.empty:
-    st.sidebar.info("選択された⽇付範囲にデータがありません。別の範囲を選択してください。")
-else:
-    if analysis_option == "データ概要":
-        st.write("選択された分析オプション: データ概要")
-        st.dataframe(filtered_data)
-    elif analysis_option == "売上分析":
-        st.write("選択された分析オプション: 売上分析")
-        st.line_chart(filtered_data.set_index('⽇付')['売上'])
-    else:
-        st.write("選択された分析オプション: 商品別分析")
-        product_sales = filtered_data.groupby('商品')['売上'].sum().reset_index()
-        st.bar_chart(product_sales.set_index('商品'))
-
-st.subheader("⾼度なエクスパンダーの使⽤例")
-with st.expander("カスタム分析"):
-    selected_product = st.selectbox("分析する商品を選択", sales_data['商品'].unique())
-    product_data = filtered_data[filtered_data['商品'] == selected_product]
-    if product_data.empty:
-        st.info("選択された⽇付範囲と商品の組み合わせにデータがありません。")
-    else:
-        st.write(f"商品 {selected_product} の分析")
-        st.line_chart(product_data.set_index('⽇付')['売上'])
-        if st.checkbox("詳細統計を表⽰"):
-            st.write(product_data['売上'].describe())
-
-
-
-with st.container():
-    st.subheader("ネストされたレイアウト")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.write("左側のカラム")
-        with st.container():
-            st.write("左側のコンテナ")
-            slider_value = st.slider("値を選択", 0, 100, 50,
-            key="nested_slider")
-            st.write(f"選択された値: {slider_value}")
-    with col2:
-        st.write("右側のカラム")
-        with st.container():
-            st.write("右側の上部コンテナ")
-            option = st.selectbox("オプションを選択", ["オプション1", "オプション2", "オプション3"], key="nested_select")
-        st.write(f"選択されたオプション: {option}")
-        with st.container():
-            st.write("右側の下部コンテナ")
-            if st.button("クリックしてください", key="nested_button"):
-                st.write("ボタンがクリックされました！")
-
-
-
-
-with st.container():
-    st.subheader("データ分析セクション")
-    st.write("このコンテナ内にデータ分析関連の要素をグループ化します。")
-    data_container = st.container()
-    data = pd.DataFrame({
-        '名前': ['Alice', 'Bob', 'Charlie', 'David'],
-        '年齢': [25, 30, 35, 40],
-        '都市': ['東京', '⼤阪', '名古屋', '福岡']
-    })
-    data_container.dataframe(data)
-    analysis_type = st.radio("分析タイプ", ["平均年齢", "都市別⼈数"], key="analysis_type")
-    if analysis_type == "平均年齢":
-        data_container.write(f"平均年齢: {data['年齢'].mean():.1f}歳")
-    else:
-        data_container.write(data['都市'].value_counts())
-
-
-col_left, col_right = st.columns([2, 1])
-with col_left:
-    st.subheader("左側（幅広）")
-    chart_data = pd.DataFrame(np.random.randn(20, 3), columns=["A", "B", "C"])
-    selected_column = st.selectbox("データを選択", ["A", "B", "C"], key="data_select")
-    st.line_chart(chart_data[selected_column])
-with col_right:
-    st.subheader("右側（幅狭）")
-    st.write(f"選択されたデータ: {selected_column}")
-    st.write(f"平均値: {chart_data[selected_column].mean():.2f}")
-    st.write(f"最⼤値: {chart_data[selected_column].max():.2f}")
-    st.write(f"最⼩値: {chart_data[selected_column].min():.2f}")
-
-st.header('レッスン13: カラムとコンテナによるレイアウト')
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.subheader("列1")
-    st.write("ここは1列⽬です。")
-    st.button("ボタン1", key="button1")
-with col2:
-    st.subheader("列2")
-    st.write("ここは2列⽬です。")
-    st.checkbox("チェックボックス", key="checkbox1")
-with col3:
-    st.subheader("列3")
-    st.write("ここは3列⽬です。")
-    st.radio("ラジオボタン", ["選択肢1", "選択肢2", "選択肢3"], key="radio1")
-
-
-
-
-st.header('レッスン12: ファイルアップローダー')
-
-uploaded_excel = st.file_uploader("Excelファイルをアップロードしてください", type=["xlsx", "xls"], key="excel_uploader")
-if uploaded_excel is not None:
-    excel_file = openpyxl.load_workbook(uploaded_excel)
-    sheet_names = excel_file.sheetnames
-    st.write("シート名:")
-    st.write(sheet_names)
-    selected_sheet = st.radio("分析するシートを選択してください", sheet_names, key="sheet_selector")
-    df_excel = pd.read_excel(uploaded_excel, sheet_name=selected_sheet)
-    st.write(f"選択されたシート '{selected_sheet}' の内容:")
-    st.write(df_excel)
-    # 列の選択
-    selected_columns = st.multiselect("表⽰する列を選択してください",
-    df_excel.columns.tolist(), key="excel_column_select")
-    if selected_columns:
-        st.write("選択された列のデータ:")
-        st.write(df_excel[selected_columns])
-    # 散布図の作成（2つの列が選択された場合）
-    if len(selected_columns) == 2:
-        fig = go.Figure(data=go.Scatter(x=df_excel[selected_columns[0]], y=df_excel[selected_columns[1]], mode='markers'))
-        fig.update_layout(title=f"{selected_columns[0]} vs {selected_columns[1]}の散布図")
-        st.plotly_chart(fig)
-
-
-
-uploaded_csv = st.file_uploader("CSVファイルをアップロードしてください",
-type="csv", key="csv_uploader")
-if uploaded_csv is not None:
-    df_csv = pd.read_csv(uploaded_csv)
-    st.write("アップロードされたCSVファイルの内容:")
-    st.write(df_csv)
-    st.write("データの基本統計:")
-    st.write(df_csv.describe())
-    # 数値列の選択
-    numeric_columns = df_csv.select_dtypes(include=[np.number]).columns.tolist()
-    selected_column = st.selectbox("グラフ化する列を選択してください", numeric_columns,     key="csv_column_select")
-    # ヒストグラムの作成
-    fig = go.Figure(data=[go.Histogram(x=df_csv[selected_column])])
-    fig.update_layout(title=f"{selected_column}のヒストグラム")
-    st.plotly_chart(fig)
-
-
-st.header('レッスン11: スライダーとセレクトボックス')
-
-columns_to_plot = st.multiselect('プロットする列を選択', ['A', 'B', 'C', 'D'],
-default=['A', 'B'], key='column_multiselect')
-num_points = st.slider('データポイント数', min_value=50, max_value=1000,
-value=200, step=50, key='points_slider')
-data_sample4 = pd.DataFrame(np.random.randn(num_points, 4), columns=['A',
-'B', 'C', 'D'])
-fig4 = go.Figure()
-for col in columns_to_plot:
-    fig4.add_trace(go.Scatter(x=data_sample4.index, y=data_sample4[col],
-    mode='lines+markers', name=col))
-st.plotly_chart(fig4)
-
-
-data_sample3 = pd.DataFrame(np.random.randn(200, 2), columns=['M', 'N'])
-color_option = st.selectbox('マーカーの⾊を選択', ['blue', 'red', 'green','purple'], key='color_select')
-fig3 = go.Figure()
-fig3.add_trace(go.Scatter(x=data_sample3['M'], y=data_sample3['N'],
-mode='markers', marker=dict(color=color_option)))
-st.plotly_chart(fig3)
-
-
-data_sample2 = pd.DataFrame(np.random.uniform(0, 100, size=(1000, 2)), columns=['P', 'Q'])
-range_values = st.slider('値の範囲を選択', min_value=0.0, max_value=100.0,
-                                value=(25.0, 75.0), key='range_slider')
-filtered_data = data_sample2[(data_sample2['P'] >= range_values[0]) &
-                                (data_sample2['P'] <= range_values[1])]
-fig2 = go.Figure()
-fig2.add_trace(go.Scatter(x=filtered_data['P'], y=filtered_data['Q'], mode='markers'))
-st.plotly_chart(fig2)
-
-
-sample_size = st.slider('サンプルサイズを選択', min_value=10, max_value=1000, value=100, step=10, key='sample_slider')
-data_sample1 = pd.DataFrame(np.random.randn(sample_size, 2), columns=['X', 'Y'])
-fig1 = go.Figure()
-fig1.add_trace(go.Scatter(x=data_sample1['X'], y=data_sample1['Y'], mode='markers'))
-st.plotly_chart(fig1)
-
-
-column_options = st.multiselect(
-    '表⽰する列を選択してください',
-    ['X', 'Y', 'Z'],
-    ['X', 'Y'],
-    key='column_selection')
-
-sample_data = pd.DataFrame(np.random.randn(10, 3), columns=['X', 'Y', 'Z'])
-st.write(sample_data[column_options])
-
-
-if 'counter' not in st.session_state:
-    st.session_state.counter = 0
-col1, col2, col3 = st.columns(3)
-if col1.button('カウントアップ', key='count_up'):
-    st.session_state.counter += 1
-if col2.button('カウントダウン', key='count_down'):
-    st.session_state.counter -= 1
-if col3.button('リセット', key='reset_count'):
-    st.session_state.counter = 0
-st.write(f"現在のカウント: {st.session_state.counter}")
-
-show_chart = st.checkbox('チャートを表⽰', key='show_chart')
-if show_chart:
-    chart_data = pd.DataFrame(np.random.randn(20, 3), columns=['X', 'Y',
-'Z'])
-    fig = go.Figure()
-    for column in chart_data.columns:
-        fig.add_trace(go.Scatter(x=chart_data.index, y=chart_data[column],
-mode='lines', name=column))
-    st.plotly_chart(fig)
-
-st.header('レッスン10: ボタンとチェックボックス')
-if st.button('データを⽣成', key='generate_data'):
-    random_data = pd.DataFrame(np.random.randn(20, 3), columns=['X', 'Y',
-'Z'])
-    st.write(random_data)
-
-
-
-
-
-
-
-
-
-
-st.header('レッスン9: セッション状態の管理')
-
-if 'count' not in st.session_state:
-    st.session_state.count = 0
-
-st.write(f"現在のカウント: {st.session_state.count}")
-
-if st.button('カウントアップ'):
-    st.session_state.count += 1
-    st.rerun()
-
-if 'user_name' not in st.session_state:
-    st.session_state.user_name = ""
-if 'user_email' not in st.session_state:
-    st.session_state.user_email = ""
-user_name = st.text_input("ユーザー名", value=st.session_state.user_name)
-user_email = st.text_input("メールアドレス",
-value=st.session_state.user_email)
-if st.button("ユーザー情報を保存"):
-    st.session_state.user_name = user_name
-    st.session_state.user_email = user_email
-    st.success("ユーザー情報が保存されました！")
-st.write(f"セッションに保存されたユーザー名: {st.session_state.user_name}")
-st.write(f"セッションに保存されたメールアドレス: {st.session_state.user_email}")
-
-if 'df' not in st.session_state:
-    st.session_state.df = pd.DataFrame(columns=['商品', '価格'])
-
-product = st.text_input("商品名を⼊⼒")
-price = st.number_input("価格を⼊⼒", min_value=0)
-
-if st.button("商品データを追加"):
-    new_data = pd.DataFrame({'商品': [product], '価格': [price]})
-    st.session_state.df = pd.concat([st.session_state.df, new_data],
-                                    ignore_index=True)
-st.write("現在の商品データ:")
-st.write(st.session_state.df)
-
-if st.button("データをリセット"):
-    st.session_state.df = pd.DataFrame(columns=['商品', '価格'])
-    st.rerun()
-
-
-st.header("レッスン8: キャッシュを使⽤したパフォーマンス最適化")
-
-@st.cache_data(ttl=10)
-def get_current_time():
-    return pd.Timestamp.now()
-
-
-st.subheader("キャッシュの無効化")
-st.write("現在時刻（10秒ごとに更新）:")
-st.write(get_current_time())
-
-@st.cache_resource
-def load_large_dataset():
-    return pd.DataFrame(
-    np.random.randn(1000000, 5),
-    columns=['A', 'B', 'C', 'D', 'E']
-)
-    
-    
-st.subheader("⼤規模データセットの処理")
-start_time = time.time()
-large_data = load_large_dataset()
-end_time = time.time()
-st.write(f"⼤規模データセット読み込み時間: {end_time - start_time:.2f} 秒")
-st.write(f"データセットの形状: {large_data.shape}")
-st.write(large_data.head())
-
-def generate_large_dataset():
-    # ⼤きなデータセットを⽣成（約10秒かかる）
-    data = pd.DataFrame(np.random.randn(1000000, 5), columns=["A", "B", "C", "D", "E"])
-    return data
-
-
-@st.cache_data
-def load_data_cached():
-    return generate_large_dataset()
-
-
-def load_data_uncached():
-    return generate_large_dataset()
-
-
-st.subheader("キャッシュなしの場合")
-start_time = time.time()
-data_uncached = load_data_uncached()
-end_time = time.time()
-st.write(f"データ読み込み時間: {end_time - start_time:.2f} 秒")
-st.write(data_uncached.head())
-st.subheader("キャッシュありの場合")
-start_time = time.time()
-data_cached = load_data_cached()
-end_time = time.time()
-st.write(f"データ読み込み時間: {end_time - start_time:.2f} 秒")
-st.write(data_cached.head())
-st.write("キャッシュありの場合、2回⽬以降の読み込みは⾮常に⾼速になります。"),
-
-
-st.header("レッスン7: 円グラフ(plotly,go)の作成")
-# サンプルデータの作成
-data = {"商品": ["A", "B", "C", "D", "E"], "売上": [300, 200, 180, 150, 120]}
-df = pd.DataFrame(data)
-st.write("サンプルデータ:")
-st.dataframe(df)
-
-# 基本的な円グラフの作成
-fig = go.Figure(data=[go.Pie(labels=df["商品"], values=df["売上"])])
-fig.update_layout(title="商品別売上⽐率")
-st.plotly_chart(fig)
-
-# カスタマイズされた円グラフの作成
-colors = ["gold", "mediumturquoise", "darkorange", "lightgreen", "lightcoral"]
-fig = go.Figure(
-    data=[
-        go.Pie(
-            labels=df["商品"],
-            values=df["売上"],
-            hole=0.3,
-            marker=dict(colors=colors, line=dict(color="#000000", width=2)),
-        )
-    ]
-)
-fig.update_traces(
-    textposition="inside",
-    textinfo="percent+label",
-    hoverinfo="label+value+percent",
-    textfont_size=14,
-)
-fig.update_layout(
-    title="商品別売上⽐率（詳細版）",
-    font=dict(family="Meiryo", size=12),
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-    annotations=[dict(text="総売上", x=0.5, y=0.5, font_size=20, showarrow=False)],
-)
-st.plotly_chart(fig)
-
-
-st.title("私のStreamlitアプリです♡")
-st.header("レッスン3: テキスト要素の追加")
-# 通常のテキスト
-st.text("これは通常のテキストです。")
-# Markdown形式のテキスト
-st.markdown("これは **太字** で、*イタリック* です。")
-# LaTeX形式の数式
-st.latex(r"\sqrt{x^2 + y^2} = z")
-# 情報メッセージ（⻘⾊）
-st.info("データの読み込みが完了しました。")
-# 警告メッセージ（⻩⾊）
-st.warning("ファイルのサイズが⼤きいため、処理に時間がかかる可能性があります。")
-# エラーメッセージ（⾚⾊）
-st.error("ファイルの形式が正しくありません。CSVファイルをアップロードしてください。")
-# 成功メッセージ（緑⾊）
-st.success("グラフの作成が完了しました。")
-
-code = """def hello():
-print("Hello, Streamlit!")"""
-st.code(code, language="python")
-
-st.header("レッスン4:データ入力と表示")
-name = st.text_input("名前を入力")
-if name:
-    st.write(f"こんにちは{name}さん")
-
-age = st.number_input(
-    "あなたの年齢を⼊⼒してください", min_value=0, max_value=120, value=20
-)
-st.write(f"あなたは{age}歳です。")
-
-date = st.date_input("⽇付を選択してください")
-st.write(f"選択された⽇付: {date}")
-
-data = {
-    "名前": ["太郎", "花⼦", "⼀郎"],
-    "年齢": [25, 30, 35],
-    "都市": ["東京", "⼤阪", "福岡"],
-}
-df = pd.DataFrame(data)
-# データフレームの表⽰
-st.subheader("データフレームの表⽰")
-st.dataframe(df)
-
-st.header("レッスン5: 折れ線グラフ(plotly,go)の作成")
-# サンプルデータの作成
-data = {
-    "⽉": ["1⽉", "2⽉", "3⽉", "4⽉", "5⽉", "6⽉"],
-    "売上": [100, 120, 140, 180, 200, 210],
-    "利益": [20, 25, 30, 40, 50, 55],
-}
-df = pd.DataFrame(data)
-st.write("サンプルデータ:")
-st.dataframe(df)
-
-fig = go.Figure()
-fig.add_trace(go.Scatter(x=df["⽉"], y=df["売上"], mode="lines+markers", name="売上"))
-fig.add_trace(go.Scatter(x=df["⽉"], y=df["利益"], mode="lines+markers", name="利益"))
-fig.update_layout(title="⽉別売上と利益", xaxis_title="⽉", yaxis_title="⾦額（万円）")
-st.plotly_chart(fig)
-
-fig = go.Figure()
-fig.add_trace(
-    go.Scatter(
-        x=df["⽉"],
-        y=df["売上"],
-        mode="lines+markers",
-        name="売上",
-        line=dict(color="blue", width=2),
-    )
-)
-fig.add_trace(
-    go.Scatter(
-        x=df["⽉"],
-        y=df["利益"],
-        mode="lines+markers",
-        name="利益",
-        line=dict(color="red", width=2),
-    )
-)
-fig.update_layout(
-    title="⽉別売上と利益の推移",
-    xaxis_title="⽉",
-    yaxis_title="⾦額（万円）",
-    font=dict(family="Meiryo", size=12),
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-    hovermode="x unified",
-)
-fig.update_xaxes(tickangle=-45)
-fig.update_yaxes(zeroline=True, zerolinewidth=2, zerolinecolor="white")
-st.plotly_chart(fig)
-
-st.header("レッスン6: 棒グラフ(plotly,go)の作成")
-# サンプルデータの作成
-data = {
-    "製品": ["A", "B", "C", "D", "E"],
-    "売上": [300, 400, 200, 600, 500],
-    "利益": [30, 60, 20, 100, 80],
-}
-df = pd.DataFrame(data)
-st.write("サンプルデータ:")
-st.dataframe(df)
-
-# 基本的な棒グラフの作成
-fig = go.Figure()
-fig.add_trace(go.Bar(x=df["製品"], y=df["売上"], name="売上"))
-fig.add_trace(go.Bar(x=df["製品"], y=df["利益"], name="利益"))
-fig.update_layout(
-    title="製品別の売上と利益",
-    xaxis_title="製品",
-    yaxis_title="⾦額（万円）",
-    barmode="group",
-)
-st.plotly_chart(fig)
-
-# カスタマイズされた棒グラフの作成
-fig = go.Figure()
-fig.add_trace(go.Bar(x=df["製品"], y=df["売上"], name="売上", marker_color="blue"))
-fig.add_trace(go.Bar(x=df["製品"], y=df["利益"], name="利益", marker_color="red"))
-fig.update_layout(
-    title="製品別の売上と利益⽐較",
-    xaxis_title="製品",
-    yaxis_title="⾦額（万円）",
-    barmode="group",
-    font=dict(family="Meiryo", size=12),
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-    hovermode="x unified",
-)
-fig.update_traces(texttemplate="%{y}", textposition="outside")
-fig.update_yaxes(range=[0, max(df["売上"].max(), df["利益"].max()) * 1.1])
-st.plotly_chart(fig)
+import time
+_import_started = time.perf_counter()
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import pandas as pd
+import plotly.graph_objects as go
+import numpy as np
+import io
+import uploads
+import disk_cache
+import dtypes
+import charts
+import generators
+import profiling
+import tables
+import jobs
+import session_store
+import sections
+import streaming
+import summaries
+import cache_layer
+from sales_index import SalesIndex
+import warmup
+# プロセスで最初のスクリプト実行のときだけ記録される（起動時間の内訳）
+warmup.record("モジュールの読み込み", time.perf_counter() - _import_started)
+
+
+
+# 各レッスンを st.fragment として定義し、ウィジェット操作時には
+# そのウィジェットを含むレッスンだけを再実行する
+if 'rerun_count' not in st.session_state:
+    st.session_state.rerun_count = 0
+st.session_state.rerun_count += 1
+if 'section_timings' not in st.session_state:
+    st.session_state.section_timings = {}
+
+profiling.install()
+# ⼤きい値や使われていない値をディスクへ退避する
+session_store.get_store().enforce()
+# 空きメモリが少なければ共有キャッシュを少しずつ減らす
+cache_layer.relieve_pressure()
+st.sidebar.toggle("開発者用プロファイラ", key="profiling_enabled")
+timed_section = profiling.timed_section
+
+
+# 売上データの生成条件。セッションごとのキャッシュのキーにも使う（オブジェクトの id は再利用されうるので使わない）
+SALES_DATA_TOKEN = ('2023-01-01', '2023-12-31', ('A', 'B', 'C'), generators.SALES_SEED)
+
+
+@st.cache_resource
+def load_sales_data():
+    # 1年分のデータを⽣成して型を縮め、⽇付でソートした索引と⼀緒に全セッションで使い回す
+    start, end, products, seed = SALES_DATA_TOKEN
+    sales_data, dtype_report = dtypes.optimize_dtypes(generators.sales_frame(start, end, products, seed))
+    return sales_data, SalesIndex(sales_data), dtype_report
+
+
+_load_started = time.perf_counter()
+sales_data, sales_index, sales_dtype_report = load_sales_data()
+warmup.record("売上データの準備", time.perf_counter() - _load_started)
+
+st.sidebar.title("データ分析ツール")
+analysis_option = st.sidebar.radio("分析オプション", ("データ概要", "売上分析", "商品別分析"))
+date_range = st.sidebar.date_input(
+    "⽇付範囲",
+    value=(sales_data['⽇付'].min().date(), sales_data['⽇付'].max().date())
+)
+# ⽇付でソートした索引を使い、範囲の抽出は⼆分探索によるスライスで⾏う
+filtered_data = sales_index.rows(date_range[0], date_range[1])
+if filtered_data.empty:
+    st.sidebar.info("選択された⽇付範囲にデータがありません。別の範囲を選択してください。")
+
+
+@st.cache_resource
+def chart_data_summary(rows, columns, seed):
+    # 列ごとの要約を一度だけ作り、再実行のたびにデータを走査しない
+    return summaries.FrameSummary.from_frame(generators.normal_frame(rows, columns, seed))
+
+
+@st.cache_resource
+def get_live_feed():
+    # 全セッションで 1 つの取り込み元を共有する
+    return streaming.sales_feed()
+
+
+def live_sales():
+    # 新しく追記された行だけを取り込み、集計を差分で更新してから直近の行を描く
+    feed = get_live_feed()
+    feed.refresh()
+    recent, stats, totals = feed.snapshot()
+    if not stats["count"]:
+        st.info("まだ取り込んだデータがありません。")
+        return
+    previous = st.session_state.get("live_sales_previous", stats)
+    st.session_state.live_sales_previous = stats
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("取り込み件数", f"{stats['count']:,}", delta=f"{stats['count'] - previous['count']:,}")
+    col2.metric("総売上", f"{stats['sum']:,.0f}円", delta=f"{stats['sum'] - previous['sum']:,.0f}円")
+    col3.metric("平均売上", f"{stats['mean']:.2f}円", delta=f"{stats['mean'] - previous['mean']:.2f}円")
+    col4.metric("最⾼売上", f"{stats['max']:,.0f}円")
+    st.line_chart(recent.set_index('⽇時')['売上'])
+    st.bar_chart(totals)
+    st.caption(f"グラフは直近 {len(recent):,} ⾏、集計は取り込んだ全 {stats['count']:,} ⾏です。")
+
+
+@timed_section('レッスン14')
+def lesson14(sales_data, sales_index, sales_dtype_report, analysis_option, date_range, filtered_data):
+    st.header('レッスン14: エクスパンダーとサイドバーによるレイアウト')
+    st.subheader("エクスパンダーの使⽤例")
+    # 中身はトグルをオンにしたときだけ計算し、入力が変わるまで結果を使い回す
+    body = sections.lazy_expander("データセットの詳細を表⽰", key="sales_details")
+    if body is not None:
+        with body:
+            tables.paged_dataframe(sales_data, key="sales_table", token=SALES_DATA_TOKEN)
+            st.caption(dtypes.summary_text(sales_dtype_report))
+    body = sections.lazy_expander("グラフを表⽰", key="sales_chart")
+    if body is not None:
+        with body:
+            zoom = charts.selected_range("sales_trend_chart")
+
+            def trend_figure():
+                x, y = charts.downsample_line(sales_data['⽇付'], sales_data['売上'], zoom)
+                fig = go.Figure(data=charts.scatter(x=x, y=y, mode='lines+markers'))
+                fig.update_layout(title='⽇別売上推移')
+                return charts.zoom_to(fig, zoom)
+            fig = sections.cached("sales_trend_figure", (SALES_DATA_TOKEN, zoom), trend_figure)
+            charts.plotly_lod_chart(fig, key="sales_trend_chart")
+    body = sections.lazy_expander("統計情報", key="sales_stats")
+    if body is not None:
+        with body:
+            # 累積和から O(1) で求まるので、結果は覚えておかない
+            stats = sales_index.stats()
+            st.write(f"総売上: {stats['sum']:,.0f}円")
+            st.write(f"平均売上: {stats['mean']:.2f}円")
+            st.write(f"最⾼売上: {stats['max']:,.0f}円")
+            st.write(f"最低売上: {stats['min']:,.0f}円")
+
+    st.subheader("ライブ売上（ストリーミング）")
+    if st.toggle("ライブ更新", key="live_sales_enabled"):
+        # このフラグメントだけが一定間隔で再実行される
+        st.fragment(live_sales, run_every=streaming.REFRESH_SECONDS)()
+    else:
+        st.caption("オンにすると、追記される売上データを取り込みながら集計とグラフを更新します。")
+
+
+    st.subheader("サイドバーの使⽤例")
+    if not filtered_data.empty:
+        if analysis_option == "データ概要":
+            st.write("選択された分析オプション: データ概要")
+            tables.paged_dataframe(filtered_data, key="filtered_sales_table", token=tuple(date_range))
+        elif analysis_option == "売上分析":
+            st.write("選択された分析オプション: 売上分析")
+            st.line_chart(sales_index.daily_totals(date_range[0], date_range[1]))
+        else:
+            st.write("選択された分析オプション: 商品別分析")
+            product_sales = sales_index.product_totals(date_range[0], date_range[1])
+            st.bar_chart(product_sales.set_index('商品'))
+
+    st.subheader("⾼度なエクスパンダーの使⽤例")
+    body = sections.lazy_expander("カスタム分析", key="custom_analysis")
+    if body is not None:
+        with body:
+            selected_product = st.selectbox("分析する商品を選択", sales_index.products)
+            product_data = sales_index.rows(date_range[0], date_range[1], product=selected_product)
+            if product_data.empty:
+                st.info("選択された⽇付範囲と商品の組み合わせにデータがありません。")
+            else:
+                st.write(f"商品 {selected_product} の分析")
+                st.line_chart(product_data.set_index('⽇付')['売上'])
+                if st.checkbox("詳細統計を表⽰"):
+                    # 商品と日付範囲の行は by_product 上で連続しているので、スライスをそのまま集計する（分位点も厳密値）
+                    st.write(product_data['売上'].describe())
+
+
+
+    with st.container():
+        st.subheader("ネストされたレイアウト")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("左側のカラム")
+            with st.container():
+                st.write("左側のコンテナ")
+                slider_value = st.slider("値を選択", 0, 100, 50,
+                key="nested_slider")
+                st.write(f"選択された値: {slider_value}")
+        with col2:
+            st.write("右側のカラム")
+            with st.container():
+                st.write("右側の上部コンテナ")
+                option = st.selectbox("オプションを選択", ["オプション1", "オプション2", "オプション3"], key="nested_select")
+            st.write(f"選択されたオプション: {option}")
+            with st.container():
+                st.write("右側の下部コンテナ")
+                if st.button("クリックしてください", key="nested_button"):
+                    st.write("ボタンがクリックされました！")
+
+
+
+
+    with st.container():
+        st.subheader("データ分析セクション")
+        st.write("このコンテナ内にデータ分析関連の要素をグループ化します。")
+        data_container = st.container()
+        data = pd.DataFrame({
+            '名前': ['Alice', 'Bob', 'Charlie', 'David'],
+            '年齢': [25, 30, 35, 40],
+            '都市': ['東京', '⼤阪', '名古屋', '福岡']
+        })
+        data_container.dataframe(data)
+        analysis_type = st.radio("分析タイプ", ["平均年齢", "都市別⼈数"], key="analysis_type")
+        if analysis_type == "平均年齢":
+            data_container.write(f"平均年齢: {data['年齢'].mean():.1f}歳")
+        else:
+            data_container.write(data['都市'].value_counts())
+
+
+    col_left, col_right = st.columns([2, 1])
+    with col_left:
+        st.subheader("左側（幅広）")
+        chart_data = generators.normal_frame(20, ("A", "B", "C"), generators.CHART_SEED)
+        chart_stats = chart_data_summary(20, ("A", "B", "C"), generators.CHART_SEED)
+        selected_column = st.selectbox("データを選択", ["A", "B", "C"], key="data_select")
+        st.line_chart(chart_data[selected_column])
+    with col_right:
+        st.subheader("右側（幅狭）")
+        st.write(f"選択されたデータ: {selected_column}")
+        st.write(f"平均値: {chart_stats[selected_column].mean:.2f}")
+        st.write(f"最⼤値: {chart_stats[selected_column].max:.2f}")
+        st.write(f"最⼩値: {chart_stats[selected_column].min:.2f}")
+
+
+@timed_section('レッスン13')
+def lesson13():
+    st.header('レッスン13: カラムとコンテナによるレイアウト')
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.subheader("列1")
+        st.write("ここは1列⽬です。")
+        st.button("ボタン1", key="button1")
+    with col2:
+        st.subheader("列2")
+        st.write("ここは2列⽬です。")
+        st.checkbox("チェックボックス", key="checkbox1")
+    with col3:
+        st.subheader("列3")
+        st.write("ここは3列⽬です。")
+        st.radio("ラジオボタン", ["選択肢1", "選択肢2", "選択肢3"], key="radio1")
+
+
+def get_upload_cache():
+    # 全セッションで共有する解析済みアップロードのキャッシュ（最も長く使われていないものから追い出す）
+    return cache_layer.get_cache("アップロード", max_bytes=uploads.UPLOAD_CACHE_MAX_BYTES)
+
+
+def upload_digest(uploaded_file):
+    # 同じアップロードに対して再実行のたびにハッシュを計算しないよう file_id ごとに覚えておく
+    digests = st.session_state.setdefault("upload_digests", {})
+    if uploaded_file.file_id not in digests:
+        digests[uploaded_file.file_id] = uploads.content_digest(uploaded_file)
+    return digests[uploaded_file.file_id]
+
+
+@st.cache_resource
+def get_job_pool():
+    # 全セッションで共有するワーカープロセスのプール
+    return jobs.JobPool()
+
+
+def run_in_worker(slot, key, func, *args, label="処理中..."):
+    # 重い処理をワーカープロセスで実行し、完了まで進捗バーを更新する。
+    # 実行中に入力が変わって再実行されると、同じ slot の古いジョブは取り消される
+    pool = get_job_pool()
+    session_id = get_script_run_ctx().session_id
+    job = pool.submit(session_id, slot, key, func, *args)
+    progress = st.progress(0.0, text=label)
+    result = pool.wait(session_id, slot, job, lambda fraction: progress.progress(fraction, text=label))
+    progress.empty()
+    return result
+
+
+def load_excel_upload(uploaded_file, digest, sheet_name):
+    # (DataFrame, データ型の最適化レポート) を返す
+    cache_key = ("excel", digest, sheet_name)
+    df = disk_cache.load_frame(cache_key)
+    if df is not None:
+        return df, disk_cache.load_frame(jobs.report_key(cache_key))
+    df, dtype_report = run_in_worker("excel_upload", cache_key, jobs.prepare_excel, cache_key,
+                                     uploaded_file.getvalue(), sheet_name, label="Excelファイルを読み込み中...")
+    # ワーカーが書いたディスクキャッシュをメモリマップで開く（Arrow に変換できなかった場合は返された DataFrame）
+    if df is None:
+        df = disk_cache.load_frame(cache_key)
+    if df is None:
+        # 開く前に上限で消されていたら、DataFrame を送り返させて読み直す
+        df, dtype_report = run_in_worker("excel_upload", cache_key + ("frame",), jobs.prepare_excel, cache_key,
+                                         uploaded_file.getvalue(), sheet_name, True,
+                                         label="Excelファイルを読み込み中...")
+    return df, dtype_report
+
+
+def load_csv_upload(uploaded_file, digest):
+    # 読み込みと describe() はワーカーで⾏い、(DataFrame, 基本統計, データ型の最適化レポート) を返す
+    cache_key = ("csv", digest)
+    df = disk_cache.load_frame(cache_key)
+    if df is not None:
+        describe = disk_cache.load_frame(jobs.describe_key(cache_key))
+        # 基本統計を保存する前のバージョンで作られたディスクキャッシュにはないので、その場合だけ計算する
+        return (df, df.describe() if describe is None else describe,
+                disk_cache.load_frame(jobs.report_key(cache_key)))
+    df, describe, dtype_report = run_in_worker("csv_upload", cache_key, jobs.prepare_csv, cache_key,
+                                               uploaded_file.getvalue(), label="CSVファイルを読み込み中...")
+    if df is None:
+        df = disk_cache.load_frame(cache_key)
+    if df is None:
+        # 開く前に上限で消されていたら、DataFrame を送り返させて読み直す
+        df, describe, dtype_report = run_in_worker("csv_upload", cache_key + ("frame",), jobs.prepare_csv, cache_key,
+                                                   uploaded_file.getvalue(), True, label="CSVファイルを読み込み中...")
+    return df, describe, dtype_report
+
+
+def show_dtype_report(dtype_report, key):
+    # 以前のバージョンで作られたディスクキャッシュにはレポートがない
+    if dtype_report is None:
+        return
+    body = sections.lazy_expander("データ型の最適化", key=key)
+    if body is not None:
+        with body:
+            st.caption(dtypes.summary_text(dtype_report))
+            st.dataframe(dtype_report, hide_index=True)
+
+
+def ingest_streaming(chunks, total):
+    # チャンクを読むたびに統計を併合し、最初のチャンクでプレビューを表⽰する
+    summary = uploads.StreamingSummary()
+    progress = st.progress(0.0, text="読み込み中...")
+    preview = st.empty()
+    for chunk, position in chunks:
+        if summary.rows == 0:
+            preview.dataframe(chunk.head(100))
+        summary.update(chunk)
+        if total:
+            progress.progress(min(position / total, 1.0), text=f"{summary.rows:,} ⾏を読み込みました")
+    progress.empty()
+    return summary
+
+
+@timed_section('レッスン12')
+def lesson12():
+    st.header('レッスン12: ファイルアップローダー')
+    upload_cache = get_upload_cache()
+
+    uploaded_excel = st.file_uploader("Excelファイルをアップロードしてください", type=["xlsx", "xls"], key="excel_uploader")
+    if uploaded_excel is not None:
+        sheet_names = upload_cache.get_or_load(
+            ("excel-sheets", upload_digest(uploaded_excel)),
+            lambda: uploads.excel_sheet_names(uploaded_excel))
+        st.write("シート名:")
+        st.write(sheet_names)
+        selected_sheet = st.radio("分析するシートを選択してください", sheet_names, key="sheet_selector")
+        streaming = st.checkbox("チャンク単位で読み込む（⼤きなファイル向け）",
+        value=uploaded_excel.size > uploads.STREAMING_THRESHOLD_BYTES, key="excel_streaming")
+        if streaming:
+            summary = upload_cache.get_or_load(
+                ("excel-stream", upload_digest(uploaded_excel), selected_sheet),
+                lambda: ingest_streaming(
+                    uploads.iter_excel_chunks(uploaded_excel, selected_sheet),
+                    uploads.excel_row_count(uploaded_excel, selected_sheet)))
+            excel_token = ("excel-stream", upload_digest(uploaded_excel), selected_sheet)
+            if summary.sample is None:
+                # 空のシートはチャンクが 1 つも読まれない
+                df_excel = pd.DataFrame()
+                st.info(f"シート '{selected_sheet}' にはデータがありません。")
+            else:
+                df_excel = summary.sample
+                st.write(f"選択されたシート '{selected_sheet}' の内容:")
+                st.caption(f"全 {summary.rows:,} ⾏のうち {len(df_excel):,} ⾏のランダムサンプルを表⽰しています。")
+                tables.paged_dataframe(df_excel, key="excel_table", token=excel_token)
+        else:
+            df_excel, excel_report = upload_cache.get_or_load(
+                ("excel", upload_digest(uploaded_excel), selected_sheet),
+                lambda: load_excel_upload(uploaded_excel, upload_digest(uploaded_excel), selected_sheet))
+            excel_token = ("excel", upload_digest(uploaded_excel), selected_sheet)
+            st.write(f"選択されたシート '{selected_sheet}' の内容:")
+            tables.paged_dataframe(df_excel, key="excel_table", token=excel_token)
+            show_dtype_report(excel_report, key="excel_dtypes")
+        # 列の選択
+        selected_columns = st.multiselect("表⽰する列を選択してください",
+        df_excel.columns.tolist(), key="excel_column_select")
+        if selected_columns:
+            st.write("選択された列のデータ:")
+            tables.paged_dataframe(df_excel[selected_columns], key="excel_selected_table",
+                                   token=excel_token + tuple(selected_columns))
+        # 散布図の作成（2つの列が選択された場合）
+        if len(selected_columns) == 2:
+            # 別のファイル・シート・列の組に切り替えたら、前の選択範囲は使わない
+            scatter_token = excel_token + tuple(selected_columns)
+            zoom = charts.selected_range("excel_scatter_chart", scatter_token)
+            x, y = charts.downsample_scatter(df_excel[selected_columns[0]], df_excel[selected_columns[1]], zoom)
+            fig = go.Figure(data=charts.scatter(x=x, y=y, mode='markers'))
+            fig.update_layout(title=f"{selected_columns[0]} vs {selected_columns[1]}の散布図")
+            charts.plotly_lod_chart(charts.zoom_to(fig, zoom), key="excel_scatter_chart", token=scatter_token)
+
+
+
+    uploaded_csv = st.file_uploader("CSVファイルをアップロードしてください",
+    type="csv", key="csv_uploader")
+    if uploaded_csv is not None:
+        streaming = st.checkbox("チャンク単位で読み込む（⼤きなファイル向け）",
+        value=uploaded_csv.size > uploads.STREAMING_THRESHOLD_BYTES, key="csv_streaming")
+        if streaming:
+            summary = upload_cache.get_or_load(
+                ("csv-stream", upload_digest(uploaded_csv)),
+                lambda: ingest_streaming(uploads.iter_csv_chunks(uploaded_csv), uploaded_csv.size))
+            if summary.sample is not None:
+                st.write("アップロードされたCSVファイルの内容:")
+                st.caption(f"全 {summary.rows:,} ⾏のうち {len(summary.sample):,} ⾏のランダムサンプルを表⽰しています。")
+                tables.paged_dataframe(summary.sample, key="csv_table",
+                                       token=("csv-stream", upload_digest(uploaded_csv)))
+            st.write("データの基本統計:")
+            st.write(summary.describe())
+            st.caption("25%/50%/75% はチャンクごとの分位点スケッチを併合した推定値です。")
+            numeric_columns = summary.numeric_columns
+        else:
+            df_csv, csv_describe, csv_report = upload_cache.get_or_load(
+                ("csv", upload_digest(uploaded_csv)),
+                lambda: load_csv_upload(uploaded_csv, upload_digest(uploaded_csv)))
+            st.write("アップロードされたCSVファイルの内容:")
+            tables.paged_dataframe(df_csv, key="csv_table", token=("csv", upload_digest(uploaded_csv)))
+            show_dtype_report(csv_report, key="csv_dtypes")
+            st.write("データの基本統計:")
+            st.write(csv_describe)
+            # 数値列の選択
+            numeric_columns = df_csv.select_dtypes(include=[np.number]).columns.tolist()
+        selected_column = st.selectbox("グラフ化する列を選択してください", numeric_columns,     key="csv_column_select")
+        # ヒストグラムの作成
+        if streaming:
+            centers, counts, width = summary.histograms[selected_column].bins()
+            fig = go.Figure(data=[go.Bar(x=centers, y=counts, width=width)])
+        else:
+            fig = go.Figure(data=[go.Histogram(x=df_csv[selected_column])])
+        fig.update_layout(title=f"{selected_column}のヒストグラム")
+        charts.plotly_chart(fig)
+
+    body = sections.lazy_expander("アップロードキャッシュの状態", key="upload_cache_state")
+    if body is not None:
+        with body:
+            st.write(upload_cache.stats())
+
+
+@timed_section('レッスン11')
+def lesson11():
+    st.header('レッスン11: スライダーとセレクトボックス')
+
+    columns_to_plot = st.multiselect('プロットする列を選択', ['A', 'B', 'C', 'D'],
+    default=['A', 'B'], key='column_multiselect')
+    num_points = st.slider('データポイント数', min_value=50, max_value=1000,
+    value=200, step=50, key='points_slider')
+    data_sample4 = generators.normal_frame(num_points, ('A',
+    'B', 'C', 'D'), generators.SAMPLE_SEED + 4)
+    zoom = charts.selected_range("fig4_chart")
+    fig4 = go.Figure()
+    for col in columns_to_plot:
+        x, y = charts.downsample_line(data_sample4.index, data_sample4[col], zoom)
+        fig4.add_trace(charts.scatter(x=x, y=y,
+        mode='lines+markers', name=col))
+    charts.plotly_lod_chart(charts.zoom_to(fig4, zoom), key="fig4_chart")
+
+
+    data_sample3 = generators.normal_frame(200, ('M', 'N'), generators.SAMPLE_SEED + 3)
+    color_option = st.selectbox('マーカーの⾊を選択', ['blue', 'red', 'green','purple'], key='color_select')
+    fig3 = go.Figure()
+    fig3.add_trace(charts.scatter(x=data_sample3['M'], y=data_sample3['N'],
+    mode='markers', marker=dict(color=color_option)))
+    charts.plotly_chart(fig3, name="fig3")
+
+
+    data_sample2 = generators.uniform_frame(1000, ('P', 'Q'), 0, 100, generators.SAMPLE_SEED + 2)
+    range_values = st.slider('値の範囲を選択', min_value=0.0, max_value=100.0,
+                                    value=(25.0, 75.0), key='range_slider')
+    filtered_data = data_sample2[(data_sample2['P'] >= range_values[0]) &
+                                    (data_sample2['P'] <= range_values[1])]
+    fig2 = go.Figure()
+    fig2.add_trace(charts.scatter(x=filtered_data['P'], y=filtered_data['Q'], mode='markers'))
+    charts.plotly_chart(fig2, name="fig2")
+
+
+    sample_size = st.slider('サンプルサイズを選択', min_value=10, max_value=1000, value=100, step=10, key='sample_slider')
+    data_sample1 = generators.normal_frame(sample_size, ('X', 'Y'), generators.SAMPLE_SEED + 1)
+    fig1 = go.Figure()
+    fig1.add_trace(charts.scatter(x=data_sample1['X'], y=data_sample1['Y'], mode='markers'))
+    charts.plotly_chart(fig1, name="fig1")
+
+
+    column_options = st.multiselect(
+        '表⽰する列を選択してください',
+        ['X', 'Y', 'Z'],
+        ['X', 'Y'],
+        key='column_selection')
+
+    sample_data = generators.normal_frame(10, ('X', 'Y', 'Z'), generators.SAMPLE_SEED)
+    st.write(sample_data[column_options])
+
+
+    if 'counter' not in st.session_state:
+        st.session_state.counter = 0
+    col1, col2, col3 = st.columns(3)
+    if col1.button('カウントアップ', key='count_up'):
+        st.session_state.counter += 1
+    if col2.button('カウントダウン', key='count_down'):
+        st.session_state.counter -= 1
+    if col3.button('リセット', key='reset_count'):
+        st.session_state.counter = 0
+    st.write(f"現在のカウント: {st.session_state.counter}")
+
+    show_chart = st.checkbox('チャートを表⽰', key='show_chart')
+    if show_chart:
+        chart_data = generators.normal_frame(20, ('X', 'Y',
+    'Z'), generators.CHART_SEED + 1)
+        fig = go.Figure()
+        for column in chart_data.columns:
+            fig.add_trace(charts.scatter(x=chart_data.index, y=chart_data[column],
+    mode='lines', name=column))
+        st.plotly_chart(fig)
+
+
+@timed_section('レッスン10')
+def lesson10():
+    st.header('レッスン10: ボタンとチェックボックス')
+    if st.button('データを⽣成', key='generate_data'):
+        random_data = pd.DataFrame(np.random.randn(20, 3), columns=['X', 'Y',
+    'Z'])
+        st.write(random_data)
+
+
+@timed_section('レッスン9')
+def lesson9():
+    st.header('レッスン9: セッション状態の管理')
+
+    if 'count' not in st.session_state:
+        st.session_state.count = 0
+
+    st.write(f"現在のカウント: {st.session_state.count}")
+
+    # st.rerun() でスクリプト全体を再実行せず、コールバックで表示前に状態を更新する
+    def increment_count():
+        st.session_state.count += 1
+
+    st.button('カウントアップ', on_click=increment_count)
+
+    if 'user_name' not in st.session_state:
+        st.session_state.user_name = ""
+    if 'user_email' not in st.session_state:
+        st.session_state.user_email = ""
+    user_name = st.text_input("ユーザー名", value=st.session_state.user_name)
+    user_email = st.text_input("メールアドレス",
+    value=st.session_state.user_email)
+    if st.button("ユーザー情報を保存"):
+        st.session_state.user_name = user_name
+        st.session_state.user_email = user_email
+        st.success("ユーザー情報が保存されました！")
+    st.write(f"セッションに保存されたユーザー名: {st.session_state.user_name}")
+    st.write(f"セッションに保存されたメールアドレス: {st.session_state.user_email}")
+
+    # 商品データは追記に強い表としてセッションストアに置く（pd.concat による毎回のコピーをしない）
+    store = session_store.get_store()
+    if store.get('products') is None:
+        store.set('products', session_store.AppendTable(['商品', '価格']))
+
+    product = st.text_input("商品名を⼊⼒")
+    price = st.number_input("価格を⼊⼒", min_value=0)
+
+    if st.button("商品データを追加"):
+        products = store.get('products')
+        products.append({'商品': product, '価格': price})
+        store.set('products', products)
+    st.write("現在の商品データ:")
+    st.write(store.get('products').to_frame())
+
+    def reset_df():
+        store.set('products', session_store.AppendTable(['商品', '価格']))
+
+    st.button("データをリセット", on_click=reset_df)
+    st.caption("セッションストア: " + ", ".join(f"{k} {v:,.1f}" if isinstance(v, float) else f"{k} {v}"
+                                          for k, v in store.stats().items()))
+
+
+@cache_layer.memoize("現在時刻", ttl=10, max_bytes=1024 * 1024)
+def get_current_time():
+    return pd.Timestamp.now()
+
+# 一度生成したデータは Arrow 形式でディスクに置き、メモリから追い出されてもメモリマップで開き直す
+@cache_layer.memoize("⼤規模データセット", disk=True, max_bytes=256 * 1024 * 1024,
+                     version=(generators.DATASET_VERSION, generators.LARGE_SEED))
+def load_large_dataset():
+    return generators.build_normal_frame(
+    1000000,
+    ('A', 'B', 'C', 'D', 'E'), generators.LARGE_SEED
+)
+
+def generate_large_dataset():
+    # ⼤きなデータセットを⽣成（約10秒かかる）
+    data = generators.build_normal_frame(1000000, ("A", "B", "C", "D", "E"), generators.LARGE_SEED + 1)
+    return data
+
+
+@cache_layer.memoize("キャッシュありのデータセット", disk=True, max_bytes=256 * 1024 * 1024, policy="lfu",
+                     version=(generators.DATASET_VERSION, generators.LARGE_SEED + 1))
+def load_data_cached():
+    return generate_large_dataset()
+
+
+# 起動後最初のスクリプト実行と並行して、レッスン8の重いキャッシュを埋めておく
+warmup.register("⼤規模データセット", load_large_dataset)
+warmup.register("キャッシュありのデータセット", load_data_cached)
+warmup.register("ワーカープール", get_job_pool)
+
+
+def load_data_uncached():
+    # キャッシュはしないが、⽣成はワーカープロセスで⾏いスクリプトのスレッドを塞がない
+    columns = ("A", "B", "C", "D", "E")
+    return run_in_worker("large_uncached", ("generate", 1000000, columns, generators.LARGE_SEED + 1),
+                         jobs.generate_normal_frame, 1000000, columns, generators.LARGE_SEED + 1,
+                         label="データを⽣成中...")
+
+
+@timed_section('レッスン8')
+def lesson8():
+    st.header("レッスン8: キャッシュを使⽤したパフォーマンス最適化")
+
+    st.subheader("キャッシュの無効化")
+    st.write("現在時刻（10秒ごとに更新）:")
+    st.write(get_current_time())
+
+    st.subheader("⼤規模データセットの処理")
+    start_time = time.time()
+    large_data = load_large_dataset()
+    end_time = time.time()
+    st.write(f"⼤規模データセット読み込み時間: {end_time - start_time:.2f} 秒")
+    st.write(f"データセットの形状: {large_data.shape}")
+    st.write(large_data.head())
+
+    st.subheader("キャッシュなしの場合")
+    start_time = time.time()
+    data_uncached = load_data_uncached()
+    end_time = time.time()
+    st.write(f"データ読み込み時間: {end_time - start_time:.2f} 秒")
+    st.write(data_uncached.head())
+    st.subheader("キャッシュありの場合")
+    start_time = time.time()
+    data_cached = load_data_cached()
+    end_time = time.time()
+    st.write(f"データ読み込み時間: {end_time - start_time:.2f} 秒")
+    st.write(data_cached.head())
+    st.write("キャッシュありの場合、2回⽬以降の読み込みは⾮常に⾼速になります。"),
+
+
+@timed_section('レッスン7')
+def lesson7():
+    st.header("レッスン7: 円グラフ(plotly,go)の作成")
+    # サンプルデータの作成
+    data = {"商品": ["A", "B", "C", "D", "E"], "売上": [300, 200, 180, 150, 120]}
+    df = pd.DataFrame(data)
+    st.write("サンプルデータ:")
+    st.dataframe(df)
+
+    # 図は初回だけ組み立てて検証し、以降の再実行ではデータ配列だけを差し替える
+    pie_data = [dict(labels=df["商品"], values=df["売上"])]
+
+    # 基本的な円グラフの作成
+    def build_pie():
+        fig = go.Figure(data=[go.Pie(labels=df["商品"], values=df["売上"])])
+        fig.update_layout(title="商品別売上⽐率")
+        return fig
+    st.plotly_chart(charts.cached_figure("lesson7_pie", build_pie, pie_data))
+
+    # カスタマイズされた円グラフの作成
+    def build_custom_pie():
+        colors = ["gold", "mediumturquoise", "darkorange", "lightgreen", "lightcoral"]
+        fig = go.Figure(
+            data=[
+                go.Pie(
+                    labels=df["商品"],
+                    values=df["売上"],
+                    hole=0.3,
+                    marker=dict(colors=colors, line=dict(color="#000000", width=2)),
+                )
+            ]
+        )
+        fig.update_traces(
+            textposition="inside",
+            textinfo="percent+label",
+            hoverinfo="label+value+percent",
+            textfont_size=14,
+        )
+        fig.update_layout(
+            title="商品別売上⽐率（詳細版）",
+            font=dict(family="Meiryo", size=12),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+            annotations=[dict(text="総売上", x=0.5, y=0.5, font_size=20, showarrow=False)],
+        )
+        return fig
+    st.plotly_chart(charts.cached_figure("lesson7_custom_pie", build_custom_pie, pie_data))
+
+
+@timed_section('レッスン3')
+def lesson3():
+    st.title("私のStreamlitアプリです♡")
+    st.header("レッスン3: テキスト要素の追加")
+    # 通常のテキスト
+    st.text("これは通常のテキストです。")
+    # Markdown形式のテキスト
+    st.markdown("これは **太字** で、*イタリック* です。")
+    # LaTeX形式の数式
+    st.latex(r"\sqrt{x^2 + y^2} = z")
+    # 情報メッセージ（⻘⾊）
+    st.info("データの読み込みが完了しました。")
+    # 警告メッセージ（⻩⾊）
+    st.warning("ファイルのサイズが⼤きいため、処理に時間がかかる可能性があります。")
+    # エラーメッセージ（⾚⾊）
+    st.error("ファイルの形式が正しくありません。CSVファイルをアップロードしてください。")
+    # 成功メッセージ（緑⾊）
+    st.success("グラフの作成が完了しました。")
+
+    code = """def hello():
+print("Hello, Streamlit!")"""
+    st.code(code, language="python")
+
+
+@timed_section('レッスン4')
+def lesson4():
+    st.header("レッスン4:データ入力と表示")
+    name = st.text_input("名前を入力")
+    if name:
+        st.write(f"こんにちは{name}さん")
+
+    age = st.number_input(
+        "あなたの年齢を⼊⼒してください", min_value=0, max_value=120, value=20
+    )
+    st.write(f"あなたは{age}歳です。")
+
+    date = st.date_input("⽇付を選択してください")
+    st.write(f"選択された⽇付: {date}")
+
+    data = {
+        "名前": ["太郎", "花⼦", "⼀郎"],
+        "年齢": [25, 30, 35],
+        "都市": ["東京", "⼤阪", "福岡"],
+    }
+    df = pd.DataFrame(data)
+    # データフレームの表⽰
+    st.subheader("データフレームの表⽰")
+    st.dataframe(df)
+
+
+@timed_section('レッスン5')
+def lesson5():
+    st.header("レッスン5: 折れ線グラフ(plotly,go)の作成")
+    # サンプルデータの作成
+    data = {
+        "⽉": ["1⽉", "2⽉", "3⽉", "4⽉", "5⽉", "6⽉"],
+        "売上": [100, 120, 140, 180, 200, 210],
+        "利益": [20, 25, 30, 40, 50, 55],
+    }
+    df = pd.DataFrame(data)
+    st.write("サンプルデータ:")
+    st.dataframe(df)
+
+    # 図は初回だけ組み立てて検証し、以降の再実行ではデータ配列だけを差し替える
+    line_data = [dict(x=df["⽉"], y=df["売上"]), dict(x=df["⽉"], y=df["利益"])]
+
+    def build_line():
+        fig = go.Figure()
+        fig.add_trace(charts.scatter(x=df["⽉"], y=df["売上"], mode="lines+markers", name="売上"))
+        fig.add_trace(charts.scatter(x=df["⽉"], y=df["利益"], mode="lines+markers", name="利益"))
+        fig.update_layout(title="⽉別売上と利益", xaxis_title="⽉", yaxis_title="⾦額（万円）")
+        return fig
+    st.plotly_chart(charts.cached_figure("lesson5_line", build_line, line_data))
+
+    def build_custom_line():
+        fig = go.Figure()
+        fig.add_trace(
+            charts.scatter(
+                x=df["⽉"],
+                y=df["売上"],
+                mode="lines+markers",
+                name="売上",
+                line=dict(color="blue", width=2),
+            )
+        )
+        fig.add_trace(
+            charts.scatter(
+                x=df["⽉"],
+                y=df["利益"],
+                mode="lines+markers",
+                name="利益",
+                line=dict(color="red", width=2),
+            )
+        )
+        fig.update_layout(
+            title="⽉別売上と利益の推移",
+            xaxis_title="⽉",
+            yaxis_title="⾦額（万円）",
+            font=dict(family="Meiryo", size=12),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+            hovermode="x unified",
+        )
+        fig.update_xaxes(tickangle=-45)
+        fig.update_yaxes(zeroline=True, zerolinewidth=2, zerolinecolor="white")
+        return fig
+    st.plotly_chart(charts.cached_figure("lesson5_custom_line", build_custom_line, line_data))
+
+
+@timed_section('レッスン6')
+def lesson6():
+    st.header("レッスン6: 棒グラフ(plotly,go)の作成")
+    # サンプルデータの作成
+    data = {
+        "製品": ["A", "B", "C", "D", "E"],
+        "売上": [300, 400, 200, 600, 500],
+        "利益": [30, 60, 20, 100, 80],
+    }
+    df = pd.DataFrame(data)
+    st.write("サンプルデータ:")
+    st.dataframe(df)
+
+    # 図は初回だけ組み立てて検証し、以降の再実行ではデータ配列だけを差し替える
+    bar_data = [dict(x=df["製品"], y=df["売上"]), dict(x=df["製品"], y=df["利益"])]
+
+    # 基本的な棒グラフの作成
+    def build_bar():
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=df["製品"], y=df["売上"], name="売上"))
+        fig.add_trace(go.Bar(x=df["製品"], y=df["利益"], name="利益"))
+        fig.update_layout(
+            title="製品別の売上と利益",
+            xaxis_title="製品",
+            yaxis_title="⾦額（万円）",
+            barmode="group",
+        )
+        return fig
+    st.plotly_chart(charts.cached_figure("lesson6_bar", build_bar, bar_data))
+
+    # カスタマイズされた棒グラフの作成
+    def build_custom_bar():
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=df["製品"], y=df["売上"], name="売上", marker_color="blue"))
+        fig.add_trace(go.Bar(x=df["製品"], y=df["利益"], name="利益", marker_color="red"))
+        fig.update_layout(
+            title="製品別の売上と利益⽐較",
+            xaxis_title="製品",
+            yaxis_title="⾦額（万円）",
+            barmode="group",
+            font=dict(family="Meiryo", size=12),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+            hovermode="x unified",
+        )
+        fig.update_traces(texttemplate="%{y}", textposition="outside")
+        return fig
+    # 縦軸の範囲はデータから決まるので、差し替えのたびに計算する
+    y_range = [0, max(df["売上"].max(), df["利益"].max()) * 1.1]
+    st.plotly_chart(charts.cached_figure("lesson6_custom_bar", build_custom_bar, bar_data,
+                                         layout={"yaxis": {"range": y_range}}))
+
+
+warmup.start()
+lesson14(sales_data, sales_index, sales_dtype_report, analysis_option, date_range, filtered_data)
+lesson13()
+lesson12()
+lesson11()
+lesson10()
+lesson9()
+lesson8()
+lesson7()
+lesson3()
+lesson4()
+lesson5()
+lesson6()
+
+# フルスクリプト実行時のみ更新されるタイミング一覧
+with st.sidebar.expander("セクション実行時間"):
+    st.write(f"スクリプト実行回数: {st.session_state.rerun_count}")
+    st.dataframe(pd.DataFrame(st.session_state.section_timings).T)
+with st.sidebar.expander("図の送信量"):
+    # charts.plotly_chart で送った図ごとの点数と、フロントエンドへ送ったバイト数
+    st.dataframe(pd.DataFrame(st.session_state.get("transport_stats", {})).T)
+with st.sidebar.expander("起動時間"):
+    st.dataframe(pd.DataFrame(warmup.report()).T)
+with st.sidebar.expander("共有キャッシュ"):
+    # キャッシュごとのヒット率・使用量と、エントリごとのサイズ・経過時間
+    st.dataframe(pd.DataFrame(cache_layer.stats()).T)
+    st.dataframe(pd.DataFrame(cache_layer.entries()), hide_index=True)
+    ratio = cache_layer.available_memory_ratio()
+    if ratio is not None:
+        st.caption(f"空きメモリ: {ratio:.0%}（{cache_layer.MIN_AVAILABLE_RATIO:.0%} を下回るとキャッシュを減らします）")
+if profiling.enabled():
+    profiling.sidebar_panel()
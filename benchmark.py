@@ -0,0 +1,223 @@
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import charts
+import uploads
+
+
+# app.py のデータ処理をヘッドレスで計測するベンチマーク
+# 使い方: python benchmark.py --rows 100000 --compare .benchmarks/前回.json
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q))
+
+
+def measure(func, repeat):
+    # repeat 回の所要時間と、別に 1 回だけ tracemalloc で計測したピークメモリを返す
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50": percentile(times, 50),
+        "p95": percentile(times, 95),
+        "mean": statistics.fmean(times),
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def summarize(times):
+    return {"p50": percentile(times, 50), "p95": percentile(times, 95), "mean": statistics.fmean(times)}
+
+
+def bench_app(repeat):
+    # スクリプト全体の再実行と、各レッスン（st.fragment）の実行時間
+    results = {}
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    start_time = time.perf_counter()
+    at.run()
+    results["app/cold_run"] = {"p50": time.perf_counter() - start_time}
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    full_runs = []
+    lessons = {}
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        at.run()
+        full_runs.append(time.perf_counter() - start_time)
+        for name, timing in at.session_state["section_timings"].items():
+            lessons.setdefault(name, []).append(timing["実行時間(秒)"])
+    # tracemalloc は実行を遅くするので、ピークメモリは時間を計らない別の 1 回で計測する（measure と同じ）
+    tracemalloc.start()
+    try:
+        at.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    results["app/rerun"] = dict(summarize(full_runs), peak_mb=peak / 1024 / 1024)
+    for name, times in lessons.items():
+        results[f"lesson/{name}"] = summarize(times)
+    return results
+
+
+def sample_upload(rows):
+    generator = np.random.default_rng(0)
+    return pd.DataFrame({
+        "年齢": generator.integers(20, 65, rows),
+        "給与": generator.integers(200000, 800000, rows),
+        "勤続年数": generator.integers(0, 40, rows),
+        "満足度": generator.integers(1, 6, rows),
+        "部署": generator.choice(["営業", "開発", "総務", "人事"], rows),
+    })
+
+
+def bench_uploads(csv_rows, excel_rows, repeat):
+    results = {}
+    csv_bytes = sample_upload(csv_rows).to_csv(index=False).encode("utf-8")
+    excel_buffer = io.BytesIO()
+    sample_upload(excel_rows).to_excel(excel_buffer, index=False, sheet_name="Sheet1")
+    excel_bytes = excel_buffer.getvalue()
+
+    def read_csv():
+        pd.read_csv(io.BytesIO(csv_bytes)).describe()
+
+    def stream_csv():
+        summary = uploads.StreamingSummary()
+        for chunk, _ in uploads.iter_csv_chunks(io.BytesIO(csv_bytes)):
+            summary.update(chunk)
+        summary.describe()
+
+    def read_excel():
+        pd.read_excel(io.BytesIO(excel_bytes), sheet_name="Sheet1").describe()
+
+    def stream_excel():
+        summary = uploads.StreamingSummary()
+        for chunk, _ in uploads.iter_excel_chunks(io.BytesIO(excel_bytes), "Sheet1"):
+            summary.update(chunk)
+        summary.describe()
+
+    results[f"upload/csv_read/{csv_rows}"] = measure(read_csv, repeat)
+    results[f"upload/csv_stream/{csv_rows}"] = measure(stream_csv, repeat)
+    results[f"upload/excel_read/{excel_rows}"] = measure(read_excel, repeat)
+    results[f"upload/excel_stream/{excel_rows}"] = measure(stream_excel, repeat)
+    return results
+
+
+def bench_figures(points, repeat):
+    # 図の構築と JSON へのシリアライズ（生データと間引き後の両方。数値配列をバイナリにした場合も）
+    results = {}
+    generator = np.random.default_rng(0)
+    x = pd.date_range("2020-01-01", periods=points, freq="min")
+    y = np.cumsum(generator.standard_normal(points))
+
+    def raw_figure():
+        return go.Figure(data=charts.scatter(x=x, y=y, mode="lines+markers"))
+
+    def lod_figure():
+        x_lod, y_lod = charts.downsample_line(x, y)
+        return go.Figure(data=charts.scatter(x=x_lod, y=y_lod, mode="lines+markers"))
+
+    for name, build in (("raw", raw_figure), ("lod", lod_figure)):
+        results[f"figure/{name}_build/{points}"] = measure(build, repeat)
+        figure = build()
+        results[f"figure/{name}_to_json/{points}"] = dict(
+            measure(figure.to_json, repeat), bytes=len(figure.to_json()))
+        results[f"figure/{name}_to_json_binary/{points}"] = dict(
+            measure(lambda: charts.encode_figure(figure)[0].to_json(), repeat),
+            bytes=len(charts.encode_figure(figure)[0].to_json()))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_PATH), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline, threshold):
+    # p50 が baseline の threshold 倍を超えたものを性能劣化として返す
+    regressions = []
+    print(f"{'ベンチマーク':<40} {'前回 p50':>10} {'今回 p50':>10} {'比率':>7}")
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or not previous.get("p50"):
+            continue
+        ratio = current["p50"] / previous["p50"]
+        mark = " ←" if ratio > threshold else ""
+        print(f"{name:<40} {previous['p50']:>10.4f} {current['p50']:>10.4f} {ratio:>6.2f}x{mark}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="app.py のデータ処理のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5, help="各ベンチマークの繰り返し回数")
+    parser.add_argument("--csv-rows", type=int, default=100000, help="CSV アップロードの行数")
+    parser.add_argument("--excel-rows", type=int, default=10000, help="Excel アップロードの行数")
+    parser.add_argument("--points", type=int, default=100000, help="図のシリアライズに使う点数")
+    parser.add_argument("--only", choices=["app", "uploads", "figures"], action="append",
+                        help="指定したグループだけ実行する（複数指定可）")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル（既定: .benchmarks/<日時>-<リビジョン>.json）")
+    parser.add_argument("--compare", help="比較する過去の結果 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="劣化とみなす p50 の比率")
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["app", "uploads", "figures"]
+    results = {}
+    if "app" in groups:
+        results.update(bench_app(args.repeat))
+    if "uploads" in groups:
+        results.update(bench_uploads(args.csv_rows, args.excel_rows, args.repeat))
+    if "figures" in groups:
+        results.update(bench_figures(args.points, args.repeat))
+
+    for name, result in sorted(results.items()):
+        extra = f"  peak {result['peak_mb']:.1f} MB" if "peak_mb" in result else ""
+        print(f"{name:<40} p50 {result['p50']:.4f}s" + (f"  p95 {result['p95']:.4f}s" if "p95" in result else "") + extra)
+
+    revision = git_revision()
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"revision": revision, "args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 件の性能劣化: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import functools
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+import disk_cache
+
+
+# 全セッションで共有するキャッシュ。キャッシュごとにメモリ上の上限（バイト）と追い出し方式（lru / lfu）を持ち、
+# disk=True のキャッシュ（値は DataFrame）はメモリから追い出しても disk_cache のファイルから読み戻せる。
+# version は値の作り方（生成コードやシード）を変えたときに変え、古いファイルを読まないようにする
+CACHE_MAX_BYTES = int(os.environ.get("PORTFOLIO_CACHE_MAX_MB", "512")) * 1024 * 1024
+POLICIES = ("lru", "lfu")
+# 空きメモリの割合がこれを下回ったら、各キャッシュのメモリ使用量を PRESSURE_SHRINK 倍まで減らす
+MIN_AVAILABLE_RATIO = float(os.environ.get("PORTFOLIO_CACHE_MIN_AVAILABLE", "0.1"))
+PRESSURE_SHRINK = 0.5
+KEY_DISPLAY_LENGTH = 60
+
+_registry_lock = threading.Lock()
+_caches = {}
+
+
+def estimate_size(value):
+    # 値がメモリ上で占めるおおよそのバイト数。nbytes を持つもの（ndarray や解析済みのアップロードなど）はそれを使う
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+def _read_fields(path):
+    # "名前 値 ..." の行からなるファイル（/proc/meminfo, memory.stat）を {名前: 値} にする
+    fields = {}
+    with open(path) as f:
+        for line in f:
+            name, value = line.split()[:2]
+            fields[name.rstrip(":")] = int(value)
+    return fields
+
+
+def available_memory_ratio():
+    # コンテナのメモリ上限（cgroup v2）があればそれに対する空き、なければ MemAvailable の割合。取れなければ None。
+    # ページキャッシュ（メモリマップした Arrow ファイルや退避ファイルを含む）は回収できるので使用中に数えない
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as f:
+                current = int(f.read())
+            inactive_file = _read_fields("/sys/fs/cgroup/memory.stat").get("inactive_file", 0)
+            return 1 - max(current - inactive_file, 0) / int(limit)
+    except (OSError, ValueError):
+        pass
+    try:
+        meminfo = _read_fields("/proc/meminfo")
+        return meminfo["MemAvailable"] / meminfo["MemTotal"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class _Entry:
+    def __init__(self, value, size, ttl):
+        now = time.monotonic()
+        self.value = value
+        self.size = size
+        self.created = now
+        self.last_access = now
+        self.hits = 0
+        self.expires = None if ttl is None else now + ttl
+        # メモリから追い出してディスクにだけある状態
+        self.on_disk = False
+
+    def expired(self, now):
+        return self.expires is not None and now >= self.expires
+
+
+class SharedCache:
+    # キーごとの値をサイズつきで保持し、合計が max_bytes を超えたら policy に従って追い出す。
+    # 同じキーの読み込みはキーごとのロックで 1 回にまとめる（全セッションで共有するのでロックで保護する）
+    def __init__(self, name, max_bytes=CACHE_MAX_BYTES, policy="lru", ttl=None, disk=False, version=None):
+        if policy not in POLICIES:
+            raise ValueError(f"policy は {POLICIES} のいずれかです: {policy}")
+        self.name = name
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.ttl = ttl
+        self.disk = disk
+        self.version = version
+        self.entries = {}
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.pressure_evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def _disk_key(self, key):
+        return ("cache_layer", self.name, self.version, key)
+
+    def _rank(self, entry):
+        if self.policy == "lfu":
+            return entry.hits, entry.last_access
+        return entry.last_access
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size_bytes -= entry.size
+
+    def _evict(self, key, entry):
+        # ディスクにファイルがあればエントリは残し、次の get でメモリマップで開き直す
+        if self.disk and os.path.exists(disk_cache.cache_path(self._disk_key(key))):
+            self.size_bytes -= entry.size
+            entry.value, entry.size, entry.on_disk = None, 0, True
+        else:
+            self._remove(key)
+
+    def _evict_to(self, limit, keep=None):
+        # limit 以下になるまで追い出し、追い出した数を返す
+        evicted = 0
+        while self.size_bytes > limit:
+            resident = [(key, entry) for key, entry in self.entries.items() if key != keep and not entry.on_disk]
+            if not resident:
+                break
+            key, entry = min(resident, key=lambda item: self._rank(item[1]))
+            self._evict(key, entry)
+            evicted += 1
+        return evicted
+
+    def _purge_expired(self, now):
+        for key in [key for key, entry in self.entries.items() if entry.expired(now)]:
+            self._remove(key)
+            self.expirations += 1
+
+    def _lookup(self, key):
+        # (見つかったか, 値) を返す。ディスクにだけあるエントリはここで読み戻す
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.expired(now):
+            self._remove(key)
+            self.expirations += 1
+            return False, None
+        if entry.on_disk:
+            value = disk_cache.load_frame(self._disk_key(key))
+            if value is None:
+                self._remove(key)
+                return False, None
+            entry.value, entry.size, entry.on_disk = value, estimate_size(value), False
+            self.size_bytes += entry.size
+            self.disk_hits += 1
+            self.evictions += self._evict_to(self.max_bytes, keep=key)
+        entry.last_access = now
+        entry.hits += 1
+        return True, entry.value
+
+    def get(self, key, default=None):
+        with self.lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        size = estimate_size(value)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self._purge_expired(time.monotonic())
+            if size > self.max_bytes:
+                return
+            self.entries[key] = _Entry(value, size, ttl)
+            self.size_bytes += size
+            self.evictions += self._evict_to(self.max_bytes, keep=key)
+        relieve_pressure()
+
+    def _load(self, key, loader):
+        if not self.disk:
+            return loader()
+        disk_key = self._disk_key(key)
+        value = disk_cache.load_frame(disk_key)
+        if value is None:
+            return disk_cache.cached_frame(disk_key, loader)
+        with self.lock:
+            self.disk_hits += 1
+        return value
+
+    def get_or_load(self, key, loader, ttl=None):
+        with self.lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            key_lock = self.loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # 待っている間に別のセッションが読み込んでいればそれを使う
+            with self.lock:
+                found, value = self._lookup(key)
+            if not found:
+                value = self._load(key, loader)
+                self.put(key, value, ttl)
+        with self.lock:
+            self.loading.pop(key, None)
+        return value
+
+    def shrink(self, fraction):
+        # メモリ使用量を fraction 倍まで減らす（メモリ逼迫時）
+        with self.lock:
+            evicted = self._evict_to(self.size_bytes * fraction)
+            self.evictions += evicted
+            self.pressure_evictions += evicted
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "ヒット": self.hits,
+                "ミス": self.misses,
+                "ヒット率": self.hits / requests if requests else 0.0,
+                "エントリ数": len(self.entries),
+                "使用量(MB)": self.size_bytes / 1024 / 1024,
+                "上限(MB)": self.max_bytes / 1024 / 1024,
+                "追い出し数": self.evictions,
+                "方式": self.policy,
+                "ディスクから読み戻し": self.disk_hits,
+                "メモリ逼迫による追い出し": self.pressure_evictions,
+                "期限切れ": self.expirations,
+            }
+
+    def describe_entries(self):
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                "キャッシュ": self.name,
+                "キー": repr(key)[:KEY_DISPLAY_LENGTH],
+                "層": "ディスク" if entry.on_disk else "メモリ",
+                "サイズ(KB)": entry.size / 1024,
+                "経過(秒)": now - entry.created,
+                "残り(秒)": None if entry.expires is None else max(entry.expires - now, 0.0),
+                "最終利用(秒前)": now - entry.last_access,
+                "ヒット": entry.hits,
+            } for key, entry in self.entries.items()]
+
+
+def get_cache(name, **options):
+    # 名前ごとに 1 つのキャッシュをプロセス全体で共有する（options は最初に作ったときだけ使う）
+    with _registry_lock:
+        if name not in _caches:
+            _caches[name] = SharedCache(name, **options)
+        return _caches[name]
+
+
+def memoize(name, **options):
+    # st.cache_data / st.cache_resource の代わりに使うデコレーター。引数をキーにして get_cache(name) に置く
+    def decorator(func):
+        cache = get_cache(name, **options)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return cache.get_or_load(key, lambda: func(*args, **kwargs))
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def relieve_pressure():
+    # 空きメモリが少なければ、すべてのキャッシュを少しずつ減らす（全消去はしない）
+    ratio = available_memory_ratio()
+    if ratio is None or ratio >= MIN_AVAILABLE_RATIO:
+        return
+    with _registry_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.shrink(PRESSURE_SHRINK)
+
+
+def stats():
+    with _registry_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def entries():
+    with _registry_lock:
+        caches = list(_caches.values())
+    return [row for cache in caches for row in cache.describe_entries()]
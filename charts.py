@@ -0,0 +1,231 @@
+import base64
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+import profiling
+
+
+# グラフの横幅（ピクセル）。1 ピクセルあたり 2 点あれば折れ線の形は変わらない
+CHART_WIDTH_PX = 700
+CHART_HEIGHT_PX = 450
+POINTS_PER_PIXEL = 2
+# 1 トレースあたりの点数がこれを超えたら SVG ではなく WebGL で描画する
+WEBGL_THRESHOLD = int(os.environ.get("PORTFOLIO_WEBGL_THRESHOLD", "1000"))
+
+# 図の数値配列を JSON のテキストではなく型付きのバイナリ（base64）で送る。PORTFOLIO_BINARY_ARRAYS=0 で無効
+BINARY_ARRAYS = os.environ.get("PORTFOLIO_BINARY_ARRAYS", "1") != "0"
+# これより短い配列はテキストのままの方が小さい
+BINARY_MIN_LENGTH = 64
+# plotly.js が読める整数型（小さい順）。int64 は読めないので収まらなければ float64 にする
+_INTEGER_CODES = ("i1", "u1", "i2", "u2", "i4", "u4")
+
+# 組み立てと検証が済んだ図の仕様（JSON 互換の dict）。図の名前 → (組み立て関数のコード, 仕様)
+_figure_specs = {}
+
+
+def max_points(width_px=CHART_WIDTH_PX):
+    return width_px * POINTS_PER_PIXEL
+
+
+def scatter(x=None, y=None, threshold=None, **kwargs):
+    # go.Scatter の代わりに使う。点数に応じて go.Scatter と go.Scattergl を切り替える
+    threshold = WEBGL_THRESHOLD if threshold is None else threshold
+    trace_type = go.Scattergl if x is not None and len(x) > threshold else go.Scatter
+    return trace_type(x=x, y=y, **kwargs)
+
+
+def _as_array(values):
+    if isinstance(values, (list, tuple, str)) or values is None:
+        return values
+    return np.asarray(values)
+
+
+def cached_figure(name, build, traces, layout=None):
+    # 初回（と build の中身を書き換えたとき）だけ build() で図を組み立てて検証し、その仕様を全セッションで共有する。
+    # 2 回目以降は仕様の各トレースのデータ配列（traces[i] の dict）と、データから決まるレイアウト（layout の
+    # 最上位キーごとに上書き）だけを差し替え、検証なしで Figure にする。トレースの種類や数が変わる図には使わない
+    code = build.__code__
+    cached = _figure_specs.get(name)
+    if cached is None or cached[0] != code:
+        cached = _figure_specs[name] = (code, build().to_plotly_json())
+    spec = cached[1]
+    data = [dict(trace, **{k: _as_array(v) for k, v in arrays.items()}) for trace, arrays in zip(spec["data"], traces)]
+    merged_layout = dict(spec["layout"])
+    for key, value in (layout or {}).items():
+        merged_layout[key] = dict(merged_layout.get(key, {}), **value) if isinstance(value, dict) else value
+    return go.Figure({"data": data, "layout": merged_layout}, _validate=False)
+
+
+def _as_numeric(values):
+    # 日付は int64 (ns) に変換して距離や面積を計算できるようにする
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("int64").to_numpy(dtype=float)
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+
+
+def _is_continuous(values):
+    # 数値と日付だけを間引きの対象にする（カテゴリや文字列の軸はそのまま描く）
+    values = pd.Series(values)
+    return pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values)
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: 各バケットから前後の点と作る三角形が最大の点を 1 つ選ぶ
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area)) if end > start else start
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return np.unique(selected)
+
+
+def grid_thin_indices(x, y, cells_x, cells_y):
+    # 散布図用: 画面を cells_x × cells_y のセルに分け、セルごとに最初の 1 点だけ残す
+    def cell(values, cells):
+        low, high = values.min(), values.max()
+        if high <= low:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.minimum(((values - low) / (high - low) * cells).astype(np.int64), cells - 1)
+    keys = cell(x, cells_x) * cells_y + cell(y, cells_y)
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(first)
+
+
+def _remember_selection(key, token):
+    # 選択が変わったときだけ呼ばれる。図が変わるとウィジェットの値は空に戻るので、範囲は
+    # 選択したときのデータを表す token と一緒に別のキーに覚えておく
+    event = st.session_state.get(key) or {}
+    boxes = event.get("selection", {}).get("box") or []
+    st.session_state[f"{key}_zoom"] = (token, (boxes[-1]["x"], boxes[-1]["y"])) if boxes else None
+
+
+def selected_range(key, token=None):
+    # 最後に選択された矩形を (x 範囲, y 範囲) として返す。未選択かダブルクリックで解除したとき、
+    # または選択後にデータ（token）が変わったときは None
+    stored = st.session_state.get(f"{key}_zoom")
+    if stored is None or stored[0] != token:
+        return None
+    return stored[1]
+
+
+def _in_range(values, numeric, bounds):
+    if bounds is None:
+        return np.ones(len(numeric), dtype=bool)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        bounds = pd.to_datetime(list(bounds), format="mixed")
+    low, high = np.sort(_as_numeric(bounds))
+    return (numeric >= low) & (numeric <= high)
+
+
+def downsample_line(x, y, zoom=None, width_px=CHART_WIDTH_PX):
+    # 折れ線: 表示範囲内の点を LTTB で max_points(width_px) 点まで間引く
+    x, y = pd.Series(x).reset_index(drop=True), pd.Series(y).reset_index(drop=True)
+    if not (_is_continuous(x) and _is_continuous(y)):
+        return x, y
+    x_num, y_num = _as_numeric(x), _as_numeric(y)
+    mask = np.isfinite(x_num) & np.isfinite(y_num) & _in_range(x, x_num, zoom[0] if zoom else None)
+    positions = np.flatnonzero(mask)
+    positions = positions[np.argsort(x_num[positions], kind="stable")]
+    keep = positions[lttb_indices(x_num[positions], y_num[positions], max_points(width_px))]
+    return x.iloc[keep], y.iloc[keep]
+
+
+def downsample_scatter(x, y, zoom=None, width_px=CHART_WIDTH_PX, height_px=CHART_HEIGHT_PX):
+    # 散布図: 表示範囲内の点を格子で間引く（外れ値も 1 点は必ず残る）。格子のセル数は max_points(width_px) 以下にする
+    x, y = pd.Series(x).reset_index(drop=True), pd.Series(y).reset_index(drop=True)
+    if not (_is_continuous(x) and _is_continuous(y)):
+        return x, y
+    x_num, y_num = _as_numeric(x), _as_numeric(y)
+    mask = np.isfinite(x_num) & np.isfinite(y_num)
+    if zoom:
+        mask &= _in_range(x, x_num, zoom[0]) & _in_range(y, y_num, zoom[1])
+    positions = np.flatnonzero(mask)
+    if len(positions) > max_points(width_px):
+        cells_y = max(int(np.sqrt(max_points(width_px) * height_px / width_px)), 1)
+        cells_x = max(max_points(width_px) // cells_y, 1)
+        positions = positions[grid_thin_indices(x_num[positions], y_num[positions], cells_x, cells_y)]
+    return x.iloc[positions], y.iloc[positions]
+
+
+def zoom_to(fig, zoom):
+    # 選択範囲を軸の表示範囲にする
+    if zoom:
+        fig.update_xaxes(range=sorted(zoom[0]))
+        fig.update_yaxes(range=sorted(zoom[1]))
+    return fig
+
+
+def _typed_array(values):
+    # plotly.js の typed array 形式 {"dtype": "f8", "bdata": base64} にする。値は変えない
+    if values.dtype.kind == "f":
+        narrowed = values.astype("<f4")
+        values = narrowed if np.array_equal(narrowed, values, equal_nan=True) else values.astype("<f8")
+    else:
+        low, high = values.min(), values.max()
+        for code in _INTEGER_CODES:
+            info = np.iinfo(np.dtype(code))
+            if info.min <= low and high <= info.max:
+                values = values.astype("<" + code)
+                break
+        else:
+            values = values.astype("<f8")
+    return {"dtype": values.dtype.str[1:], "bdata": base64.b64encode(values.tobytes()).decode("ascii")}
+
+
+def _encode_arrays(value, counts):
+    # トレースの dict をたどり、長い数値配列を typed array に置き換える（counts[0] に点数を足す）
+    if isinstance(value, dict):
+        return {key: _encode_arrays(item, counts) for key, item in value.items()}
+    if isinstance(value, np.ndarray) and value.ndim == 1 and value.dtype.kind in "iuf":
+        counts[0] += len(value)
+        return _typed_array(value) if BINARY_ARRAYS and len(value) >= BINARY_MIN_LENGTH else value
+    return value
+
+
+def encode_figure(fig):
+    # 長い数値配列を typed array に置き換えた（検証なしの）Figure と、数値配列の点数の合計を返す
+    spec = fig.to_plotly_json()
+    counts = [0]
+    data = [_encode_arrays(trace, counts) for trace in spec["data"]]
+    return go.Figure({"data": data, "layout": spec["layout"]}, _validate=False), counts[0]
+
+
+def plotly_chart(fig, name=None, **kwargs):
+    # st.plotly_chart の代わりに使う。数値配列をバイナリにしてから送り、点数と送信バイト数を
+    # name（省略時はキーか図のタイトル）ごとにセッションに記録する
+    fig, points = encode_figure(fig)
+    result, sent = profiling.measure_payload(st.plotly_chart, fig, **kwargs)
+    name = name or kwargs.get("key") or fig.layout.title.text or "（無題）"
+    st.session_state.setdefault("transport_stats", {})[name] = {
+        "形式": "バイナリ" if BINARY_ARRAYS else "JSON",
+        "点数": points,
+        "送信バイト数": sent,
+        "1点あたり(バイト)": sent / points if points else None,
+    }
+    return result
+
+
+def plotly_lod_chart(fig, key, token=None):
+    # ドラッグで囲んだ範囲を詳細表示するためのチャート（選択のたびにセクションが再実行される）。
+    # token には表示中のデータを表す値を渡し、selected_range にも同じ値を渡す
+    plotly_chart(fig, key=key, on_select=functools.partial(_remember_selection, key, token), selection_mode="box")
+    st.caption("ドラッグで範囲を選択すると、その範囲の詳細を再取得します。ダブルクリックで全体表示に戻ります。")
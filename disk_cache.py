@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import pyarrow as pa
+
+
+# 変換済みデータセットを Arrow IPC 形式で保存するディレクトリ（サーバー再起動後も残る）
+CACHE_DIR = os.environ.get(
+    "PORTFOLIO_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "datasets"),
+)
+# ディレクトリ全体の上限。超えたら最後に使われた（更新時刻が古い）ファイルから消す
+MAX_BYTES = int(os.environ.get("PORTFOLIO_DISK_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# 保存する DataFrame の形式（型の最適化の規則など）を変えたら上げる。古いファイルは読まれずに上限で消える
+FORMAT_VERSION = 2
+
+_evict_lock = threading.Lock()
+
+
+def cache_path(key):
+    # キーにはシート名などファイル名に使えない文字が入りうるのでハッシュ化する
+    name = hashlib.sha256(repr((FORMAT_VERSION, key)).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{name}.arrow")
+
+
+def _write_frame(key, df):
+    # 一時ファイルに書いてから置き換えるので、複数プロセスが同時に書いても壊れたファイルは読まれない
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    table = pa.Table.from_pandas(df)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, cache_path(key))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return os.path.getsize(cache_path(key))
+
+
+def save_frames(frames):
+    # 一緒に使うファイル（データとそのレポートなど）をまとめて書き、上限の判定ではまとめて残す。
+    # まとめたサイズが上限に収まるか（次の書き込みまでに消されないと見込めるか）を返す
+    paths, total = [], 0
+    for key, df in frames:
+        total += _write_frame(key, df)
+        paths.append(cache_path(key))
+    enforce_budget(keep=paths)
+    return total <= MAX_BYTES
+
+
+def save_frame(key, df):
+    return save_frames([(key, df)])
+
+
+def enforce_budget(keep=(), max_bytes=MAX_BYTES):
+    # 合計が max_bytes を超えていれば、更新時刻が古い順に消す（メモリマップで開いているファイルも
+    # 消してよい。開いている側はそのまま読める）
+    with _evict_lock:
+        files = []
+        for entry in os.scandir(CACHE_DIR):
+            if entry.name.endswith(".arrow"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def load_frame(key):
+    # メモリマップで開くため、数値列はコピーせずページキャッシュをプロセス間で共有できる
+    path = cache_path(key)
+    try:
+        source = pa.memory_map(path, "r")
+    except FileNotFoundError:
+        return None
+    with source:
+        table = pa.ipc.open_file(source).read_all()
+    try:
+        # 使ったファイルの更新時刻を進め、上限を超えたときに消されにくくする（atime は記録されないことがある）
+        os.utime(path)
+    except OSError:
+        pass
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def cached_frame(key, builder):
+    # ディスクにあればそれを開き、なければ builder() の結果を書き出してから開き直す
+    df = load_frame(key)
+    if df is not None:
+        return df
+    df = builder()
+    try:
+        kept = save_frame(key, df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # 型が混在した列など Arrow に変換できないデータはディスクに置かない
+        return df
+    # 上限より大きいファイルは次の書き込みで消されうるので、開き直さずに手元の DataFrame を使う
+    reopened = load_frame(key) if kept else None
+    return df if reopened is None else reopened
+
+
+def clear():
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".arrow"):
+            os.remove(os.path.join(CACHE_DIR, name))
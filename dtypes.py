@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+# ユニーク値の割合がこれ以下の文字列列はカテゴリ型にする（それ以外は Arrow の文字列型）
+CATEGORY_RATIO = 0.5
+
+
+def _optimize_column(values):
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if pd.api.types.is_integer_dtype(values):
+        downcast = "unsigned" if len(values) and values.min() >= 0 else "integer"
+        return pd.to_numeric(values, downcast=downcast)
+    if pd.api.types.is_float_dtype(values):
+        # float32 にしても値が変わらない場合だけ縮める（精度は落とさない）
+        narrowed = values.astype(np.float32)
+        same = (narrowed.astype(values.dtype) == values) | (values.isna() & narrowed.isna())
+        return narrowed if same.all() else values
+    if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+        non_null = values.dropna()
+        if not non_null.map(lambda value: isinstance(value, str)).all():
+            # 型が混在した列はそのままにする
+            return values
+        if len(values) and values.nunique() / len(values) <= CATEGORY_RATIO:
+            return values.astype("category")
+        return values.astype("string[pyarrow]")
+    return values
+
+
+def optimize_dtypes(df):
+    # 読み込んだデータの型を縮め、(最適化後の DataFrame, 列ごとの削減量のレポート) を返す
+    optimized = df.copy(deep=False)
+    rows = []
+    for column in df.columns:
+        before = df[column]
+        after = _optimize_column(before)
+        optimized[column] = after
+        rows.append({
+            "列": column,
+            "変更前": str(before.dtype),
+            "変更後": str(after.dtype),
+            "変更前(KB)": before.memory_usage(index=False, deep=True) / 1024,
+            "変更後(KB)": after.memory_usage(index=False, deep=True) / 1024,
+        })
+    return optimized, pd.DataFrame(rows)
+
+
+def summary_text(report):
+    before = report["変更前(KB)"].sum()
+    after = report["変更後(KB)"].sum()
+    ratio = before / after if after else 1.0
+    return f"データ型の最適化でメモリ使用量を {before:,.1f} KB → {after:,.1f} KB に削減しました（{ratio:.1f} 分の 1）。"
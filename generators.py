@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+# データセットごとに固定のシードを使い、再実行やベンチマークのたびに同じデータを再現する
+SALES_SEED = 14
+CHART_SEED = 13
+SAMPLE_SEED = 11
+LARGE_SEED = 8
+# 生成方法を変えたら上げる（ディスクキャッシュのキーに入れ、古いデータを読まないようにする）
+DATASET_VERSION = 1
+
+
+def rng(seed):
+    return np.random.default_rng(seed)
+
+
+def build_normal_frame(rows, columns, seed):
+    # キャッシュしない版（レッスン8の「キャッシュなし」の比較に使う）
+    return pd.DataFrame(rng(seed).standard_normal((rows, len(columns))), columns=list(columns))
+
+
+# (シード, 形状) ごとに一度だけ生成し、全セッションで同じオブジェクトを使い回す
+@st.cache_resource(max_entries=256)
+def normal_frame(rows, columns, seed):
+    return build_normal_frame(rows, columns, seed)
+
+
+@st.cache_resource(max_entries=64)
+def uniform_frame(rows, columns, low, high, seed):
+    return pd.DataFrame(rng(seed).uniform(low, high, size=(rows, len(columns))), columns=list(columns))
+
+
+@st.cache_resource(max_entries=8)
+def sales_frame(start, end, products, seed=SALES_SEED):
+    dates = pd.date_range(start=start, end=end)
+    generator = rng(seed)
+    return pd.DataFrame({
+        '⽇付': dates,
+        '売上': generator.integers(1000, 5000, len(dates)),
+        '商品': generator.choice(list(products), len(dates))
+    })
@@ -0,0 +1,177 @@
+import contextlib
+import io
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import disk_cache
+import dtypes
+import uploads
+
+
+# 重い処理をバックグラウンドのプロセスで実行するためのワーカープール。
+# 同じキーのジョブは全セッションで 1 つにまとめ、どのセッションも待たなくなったジョブは取り消す
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key, future, cancel):
+        self.key = key
+        self.future = future
+        self.cancel = cancel
+        self.subscribers = set()
+
+
+def _run(func, key, progress, cancel, *args):
+    # ワーカープロセス側: 進捗を共有辞書に書き、取り消されていたらその時点で中断する
+    def report(fraction):
+        if cancel.is_set():
+            raise JobCancelled(key)
+        progress[key] = fraction
+    return func(report, *args)
+
+
+@contextlib.contextmanager
+def _detached_main():
+    # Streamlit はアプリのスクリプトを __main__ として実行しているため、そのまま spawn すると
+    # 子プロセスが起動時に app.py 全体を実行してしまう。プロセスを起動する間だけ空の __main__ に差し替える
+    main_module = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+class JobPool:
+    def __init__(self, max_workers=None):
+        # Streamlit サーバーはスレッドを使っているので fork ではなく spawn でプロセスを作る
+        context = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        with _detached_main():
+            self.manager = context.Manager()
+        self.progress = self.manager.dict()
+        self.lock = threading.RLock()
+        self.jobs = {}
+        # (セッション ID, スロット) → そのセッションが今待っているジョブのキー
+        self.slots = {}
+
+    def submit(self, session_id, slot, key, func, *args):
+        with self.lock:
+            previous = self.slots.get((session_id, slot))
+            if previous is not None and previous != key:
+                # 入力が変わって同じスロットに別のジョブが来たら、古いジョブはもう不要
+                self._release(session_id, previous)
+            self.slots[(session_id, slot)] = key
+            job = self.jobs.get(key)
+            if job is None:
+                cancel = self.manager.Event()
+                self.progress[key] = 0.0
+                # ワーカーは submit のときに必要に応じて起動される
+                with _detached_main():
+                    future = self.executor.submit(_run, func, key, self.progress, cancel, *args)
+                job = self.jobs[key] = Job(key, future, cancel)
+                future.add_done_callback(lambda done, key=key: self._finished(key, done))
+            job.subscribers.add(session_id)
+            return job
+
+    def _release(self, session_id, key):
+        job = self.jobs.get(key)
+        if job is None:
+            return
+        job.subscribers.discard(session_id)
+        if not job.subscribers:
+            job.future.cancel()
+            job.cancel.set()
+            del self.jobs[key]
+
+    def _finished(self, key, future):
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and job.future is future:
+                del self.jobs[key]
+            self.progress.pop(key, None)
+
+    def wait(self, session_id, slot, job, on_progress, interval=0.2):
+        # 完了まで interval ごとに進捗を通知する。on_progress 内で Streamlit が再実行を
+        # 割り込ませた場合はスロットが残り、次の submit で古いジョブが取り消される
+        while True:
+            try:
+                result = job.future.result(timeout=interval)
+                break
+            except TimeoutError:
+                on_progress(self.progress.get(job.key, 0.0))
+        with self.lock:
+            if self.slots.get((session_id, slot)) == job.key:
+                del self.slots[(session_id, slot)]
+            job.subscribers.discard(session_id)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "実行中・待機中のジョブ": len(self.jobs),
+                "待っているセッション数": sum(len(job.subscribers) for job in self.jobs.values()),
+            }
+
+
+# ---- ワーカープロセスで実行する処理（pickle できるようモジュールの最上位に置く）
+
+def generate_normal_frame(report, rows, columns, seed, chunk_rows=100000):
+    # generators.build_normal_frame と同じ乱数列を、行のチャンクごとに進捗を出しながら生成する
+    generator = np.random.default_rng(seed)
+    parts = []
+    for start in range(0, rows, chunk_rows):
+        parts.append(generator.standard_normal((min(chunk_rows, rows - start), len(columns))))
+        report((start + len(parts[-1])) / rows)
+    return pd.DataFrame(np.concatenate(parts), columns=list(columns))
+
+
+def report_key(cache_key):
+    # データ型の最適化レポートは DataFrame と並べてディスクキャッシュに置く
+    return cache_key + ("dtypes",)
+
+
+def describe_key(cache_key):
+    # 基本統計も同じく並べて置き、2 回目以降は DataFrame を走査し直さない
+    return cache_key + ("describe",)
+
+
+def _save_optimized(cache_key, df, sidecars=(), return_frame=False):
+    # 型を縮めてから、DataFrame とレポート（と sidecars の (キー, DataFrame)）をまとめてディスクキャッシュに書く。
+    # (DataFrame, レポート) を返す。DataFrame はメイン側がメモリマップで開くので、Arrow に変換できない・
+    # ディスクの上限に収まらない・return_frame が指定された場合にだけ返す（それ以外は None）
+    df, report = dtypes.optimize_dtypes(df)
+    try:
+        kept = disk_cache.save_frames([(cache_key, df), (report_key(cache_key), report)] + list(sidecars))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return df, report
+    return (df if return_frame or not kept else None), report
+
+
+def prepare_csv(report, cache_key, data, return_frame=False):
+    # CSV を読み込んでディスクキャッシュに書き、基本統計と型の最適化レポートを返す。全行がメモリにあるので
+    # 基本統計は describe() の厳密値
+    parts = []
+    for chunk, position in uploads.iter_csv_chunks(io.BytesIO(data)):
+        parts.append(chunk)
+        report(position / max(len(data), 1) * 0.9)
+    df = pd.concat(parts, ignore_index=True)
+    describe = df.describe()
+    df, dtype_report = _save_optimized(cache_key, df, [(describe_key(cache_key), describe)], return_frame)
+    report(0.95)
+    return df, describe, dtype_report
+
+
+def prepare_excel(report, cache_key, data, sheet_name, return_frame=False):
+    report(0.0)
+    df = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name)
+    report(0.9)
+    return _save_optimized(cache_key, df, return_frame=return_frame)
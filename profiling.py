@@ -0,0 +1,242 @@
+import contextlib
+import functools
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+# 計測対象の要素（st.xxx と DeltaGenerator.xxx の両方を置き換える）
+PROFILED_ELEMENTS = ("plotly_chart", "dataframe", "write")
+HISTORY_SIZE = 200
+
+# セッションごとにスクリプトは別スレッドで実行されるので、計測中のフレームはスレッドごとに持つ
+_local = threading.local()
+# tracemalloc はプロセス全体で有効になるので、計測中のセクションの数を数えて 0 になったら止める
+_tracing_lock = threading.Lock()
+_tracing_sections = 0
+_owns_tracing = False
+
+
+class _Frame:
+    def __init__(self, name):
+        self.name = name
+        self.children = []
+        self.wall = self.cpu = 0.0
+        self.allocated = 0
+        self.peak = self.abs_peak = 0
+        self.payload_bytes = 0
+
+    def to_dict(self):
+        return {
+            "名前": self.name,
+            "実行時間(秒)": self.wall,
+            "CPU時間(秒)": self.cpu,
+            "確保メモリ(MB)": self.allocated / 1024 / 1024,
+            "ピークメモリ(MB)": self.peak / 1024 / 1024,
+            "送信バイト数": self.payload_bytes,
+            "子要素": [child.to_dict() for child in self.children],
+        }
+
+
+@contextlib.contextmanager
+def _counting_payload(ctx):
+    # with の間だけ ScriptRunContext.enqueue を包み、送信する ForwardMsg のサイズを数える。
+    # 入れ子になったら外側だけが数える（抜けたら元の enqueue に戻すので、ほかの送信には影響しない）
+    if ctx is None or getattr(ctx, "_profiling_counting", False):
+        yield
+        return
+    enqueue = ctx.enqueue
+
+    def counting_enqueue(msg):
+        _local.payload_bytes = getattr(_local, "payload_bytes", 0) + msg.ByteSize()
+        enqueue(msg)
+
+    ctx.enqueue = counting_enqueue
+    ctx._profiling_counting = True
+    try:
+        yield
+    finally:
+        ctx.enqueue = enqueue
+        ctx._profiling_counting = False
+
+
+def measure_payload(func, *args, **kwargs):
+    # func を実行し、その間にフロントエンドへ送ったメッセージのバイト数と一緒に返す
+    start_bytes = getattr(_local, "payload_bytes", 0)
+    with _counting_payload(get_script_run_ctx()):
+        result = func(*args, **kwargs)
+    return result, getattr(_local, "payload_bytes", 0) - start_bytes
+
+
+def _begin_tracing():
+    global _tracing_sections, _owns_tracing
+    with _tracing_lock:
+        if _tracing_sections == 0 and not tracemalloc.is_tracing():
+            # ほかで（ベンチマークなど）始めた計測は止めない
+            tracemalloc.start()
+            _owns_tracing = True
+        _tracing_sections += 1
+
+
+def _end_tracing():
+    global _tracing_sections, _owns_tracing
+    with _tracing_lock:
+        _tracing_sections -= 1
+        if _tracing_sections == 0 and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+
+
+def _profile(name, func, *args, **kwargs):
+    # 計測中のスレッドでだけフレームを積み、時間・メモリ・送信量を記録する
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        return func(*args, **kwargs), None
+    frame = _Frame(name)
+    if stack:
+        # 子の計測で tracemalloc のピークをリセットするので、親のそれまでのピークを退避しておく
+        stack[-1].abs_peak = max(stack[-1].abs_peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    start_memory = frame.abs_peak = tracemalloc.get_traced_memory()[0]
+    start_bytes = getattr(_local, "payload_bytes", 0)
+    start_cpu = time.thread_time()
+    start_time = time.perf_counter()
+    stack.append(frame)
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        stack.pop()
+        frame.wall = time.perf_counter() - start_time
+        frame.cpu = time.thread_time() - start_cpu
+        current, peak = tracemalloc.get_traced_memory()
+        frame.abs_peak = max(frame.abs_peak, peak)
+        frame.allocated = current - start_memory
+        frame.peak = frame.abs_peak - start_memory
+        frame.payload_bytes = getattr(_local, "payload_bytes", 0) - start_bytes
+        if stack:
+            stack[-1].children.append(frame)
+            stack[-1].abs_peak = max(stack[-1].abs_peak, frame.abs_peak)
+        tracemalloc.reset_peak()
+    return result, frame
+
+
+def _instrument(name, original):
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        result, _ = _profile(f"st.{name}", original, *args, **kwargs)
+        return result
+    wrapper._profiling_original = original
+    return wrapper
+
+
+def install():
+    # st.plotly_chart などを計測付きのものに置き換える（計測していないときは元の関数をそのまま呼ぶ）
+    for name in PROFILED_ELEMENTS:
+        method = getattr(DeltaGenerator, name)
+        if not hasattr(method, "_profiling_original"):
+            setattr(DeltaGenerator, name, _instrument(name, method))
+        function = getattr(st, name)
+        if not hasattr(function, "_profiling_original"):
+            setattr(st, name, _instrument(name, function))
+
+
+def enabled():
+    return st.session_state.get("profiling_enabled", False)
+
+
+def timed_section(name):
+    # フラグメント化したセクションの実行時間と実行回数を記録する。
+    # 開発者用プロファイラが有効なら、セクション内の要素ごとの内訳も記録する
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiling = enabled()
+            if profiling:
+                _begin_tracing()
+                _local.stack = []
+            start_time = time.perf_counter()
+            try:
+                if profiling:
+                    with _counting_payload(get_script_run_ctx()):
+                        _, frame = _profile(name, func, *args, **kwargs)
+                else:
+                    func(*args, **kwargs)
+            finally:
+                _local.stack = None
+                if profiling:
+                    _end_tracing()
+            elapsed = time.perf_counter() - start_time
+            timing = st.session_state.section_timings.setdefault(name, {"実行回数": 0})
+            timing["実行回数"] += 1
+            timing["実行時間(秒)"] = elapsed
+            timing["スクリプト実行"] = st.session_state.rerun_count
+            if profiling:
+                history = st.session_state.setdefault("profile_history", deque(maxlen=HISTORY_SIZE))
+                history.append({"スクリプト実行": st.session_state.rerun_count, "セクション実行": timing["実行回数"],
+                                "フレーム": frame})
+            st.caption(f"⏱ {name}: {elapsed:.3f} 秒（このセクションの実行回数: {timing['実行回数']}）")
+        return st.fragment(wrapper)
+    return decorator
+
+
+def _flatten(frame, parent_id, rows):
+    frame_id = f"{parent_id}/{frame.name}#{len(rows)}"
+    rows.append({"id": frame_id, "parent": parent_id, "label": frame.name, "wall": frame.wall,
+                 "cpu": frame.cpu, "allocated": frame.allocated / 1024 / 1024, "bytes": frame.payload_bytes})
+    for child in frame.children:
+        _flatten(child, frame_id, rows)
+
+
+def flame_figure(frames):
+    # 各セクションの最新の実行を 1 つの木にまとめ、実行時間を面積にしたアイシクル図（フレームグラフ）にする
+    rows = []
+    for frame in frames:
+        _flatten(frame, "", rows)
+    df = pd.DataFrame(rows)
+    fig = go.Figure(go.Icicle(
+        ids=df["id"], parents=df["parent"], labels=df["label"], values=df["wall"],
+        branchvalues="remainder",
+        customdata=df[["cpu", "allocated", "bytes"]],
+        hovertemplate="%{label}<br>実行時間 %{value:.4f}s<br>CPU %{customdata[0]:.4f}s"
+                      "<br>確保 %{customdata[1]:.2f}MB<br>送信 %{customdata[2]:,}B<extra></extra>",
+        tiling=dict(orientation="v", flip="y"),
+    ))
+    fig.update_layout(margin=dict(t=10, l=0, r=0, b=0), height=400)
+    return fig
+
+
+def sidebar_panel():
+    # フルスクリプト実行時にサイドバーへ表示する（フラグメントの再実行分は次のフル実行で反映される）
+    history = st.session_state.get("profile_history")
+    if not history:
+        st.sidebar.caption("プロファイラを有効にすると、次の実行から記録されます。")
+        return
+    latest = {}
+    for record in history:
+        latest[record["フレーム"].name] = record["フレーム"]
+    with st.sidebar.expander("要素別の内訳（最新の実行）", expanded=True):
+        st.plotly_chart(flame_figure(latest.values()), use_container_width=True)
+        rows = []
+        for frame in latest.values():
+            for element in [frame] + frame.children:
+                row = element.to_dict()
+                row.pop("子要素")
+                row["セクション"] = frame.name
+                rows.append(row)
+        st.dataframe(pd.DataFrame(rows).sort_values("実行時間(秒)", ascending=False), hide_index=True)
+    with st.sidebar.expander("実行履歴"):
+        history_df = pd.DataFrame([
+            {"セクション": r["フレーム"].name, "実行": i, "実行時間(秒)": r["フレーム"].wall,
+             "CPU時間(秒)": r["フレーム"].cpu, "送信バイト数": r["フレーム"].payload_bytes}
+            for i, r in enumerate(history)
+        ])
+        st.line_chart(history_df, x="実行", y="実行時間(秒)", color="セクション")
+        st.dataframe(history_df, hide_index=True)
+    st.sidebar.caption("メモリはプロセス全体の tracemalloc で計測しているため、同時に動いている他セッションの確保も含まれます。")
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+
+class _RangeMinMax:
+    # 疎テーブル: 前計算 O(n log n)、任意区間の最小・最大を O(1) で返す（行は日、列は商品）
+    def __init__(self, values, func):
+        self.func = func
+        self.levels = [values]
+        width = 1
+        while width * 2 <= len(values):
+            previous = self.levels[-1]
+            self.levels.append(func(previous[:-width], previous[width:]))
+            width *= 2
+
+    def query(self, start, end):
+        level = int(np.log2(end - start))
+        table = self.levels[level]
+        return self.func(table[start], table[end - (1 << level)])
+
+
+class SalesIndex:
+    # 日付でソートした売上データと、日×商品の累積和・疎テーブルを前計算しておき、
+    # 日付範囲の合計・商品別内訳・統計を二分探索だけで求める
+    def __init__(self, sales_data, date_column='⽇付', value_column='売上', product_column='商品'):
+        self.date_column = date_column
+        self.value_column = value_column
+        self.product_column = product_column
+        self.by_date = sales_data.sort_values(date_column, kind="stable").reset_index(drop=True)
+        dates = self.by_date[date_column].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        values = self.by_date[value_column].to_numpy(dtype=float)
+        product_codes, self.products = pd.factorize(self.by_date[product_column], sort=True)
+        self.products = np.asarray(self.products)
+        # 日付順に並んでいるので、日が変わる位置から日コードを振れる
+        day_starts = np.r_[True, dates[1:] != dates[:-1]]
+        self.days = dates[day_starts]
+        day_codes = np.cumsum(day_starts) - 1
+
+        # 日付範囲 [i, j) の行は by_date.iloc[day_offsets[i]:day_offsets[j]]
+        self.day_offsets = np.concatenate([[0], np.cumsum(np.bincount(day_codes, minlength=len(self.days)))])
+        # 商品ごとに日付順に並べたもの（商品 p の行は product_offsets[p]〜product_offsets[p + 1]）
+        order = np.lexsort((day_codes, product_codes))
+        self.by_product = self.by_date.iloc[order].reset_index(drop=True)
+        self.product_days = day_codes[order]
+        self.product_offsets = np.concatenate([[0], np.cumsum(np.bincount(product_codes, minlength=len(self.products)))])
+
+        shape = (len(self.days), len(self.products))
+        cells = day_codes * len(self.products) + product_codes
+        size = shape[0] * shape[1]
+        count = np.bincount(cells, minlength=size).astype(float).reshape(shape)
+        total = np.bincount(cells, weights=values, minlength=size).reshape(shape)
+        squares = np.bincount(cells, weights=values ** 2, minlength=size).reshape(shape)
+        # 最小・最大はセル順に並べて reduceat で求める
+        cell_order = np.argsort(cells, kind="stable")
+        sorted_cells = cells[cell_order]
+        starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        minimum = np.full(size, np.inf)
+        maximum = np.full(size, -np.inf)
+        minimum[sorted_cells[starts]] = np.minimum.reduceat(values[cell_order], starts)
+        maximum[sorted_cells[starts]] = np.maximum.reduceat(values[cell_order], starts)
+        minimum, maximum = minimum.reshape(shape), maximum.reshape(shape)
+        zeros = np.zeros((1, len(self.products)))
+        self.cum_count = np.concatenate([zeros, np.cumsum(count, axis=0)])
+        self.cum_total = np.concatenate([zeros, np.cumsum(total, axis=0)])
+        self.cum_squares = np.concatenate([zeros, np.cumsum(squares, axis=0)])
+        self.daily_total = total.sum(axis=1)
+        self.range_min = _RangeMinMax(minimum, np.minimum)
+        self.range_max = _RangeMinMax(maximum, np.maximum)
+
+    def day_range(self, start_date, end_date):
+        # 両端を含む日付範囲を days の添字範囲 [i, j) に変換する
+        i = np.searchsorted(self.days, np.datetime64(start_date, "D"), side="left")
+        j = np.searchsorted(self.days, np.datetime64(end_date, "D"), side="right")
+        return int(i), int(max(i, j))
+
+    def product_position(self, product):
+        return int(np.searchsorted(self.products, product))
+
+    def _product_span(self, start_date, end_date, product):
+        # by_product のうち、商品 product の日付範囲内の行の添字範囲 [start, end)
+        i, j = self.day_range(start_date, end_date)
+        p = self.product_position(product)
+        if p >= len(self.products) or self.products[p] != product:
+            return 0, 0
+        low, high = self.product_offsets[p], self.product_offsets[p + 1]
+        days = self.product_days[low:high]
+        return int(low + np.searchsorted(days, i, side="left")), int(low + np.searchsorted(days, j, side="left"))
+
+    def rows(self, start_date, end_date, product=None):
+        # 範囲内の行をスライスで返す（全行の走査はしない）
+        if product is None:
+            i, j = self.day_range(start_date, end_date)
+            return self.by_date.iloc[self.day_offsets[i]:self.day_offsets[j]]
+        start, end = self._product_span(start_date, end_date, product)
+        return self.by_product.iloc[start:end]
+
+    def product_totals(self, start_date, end_date):
+        i, j = self.day_range(start_date, end_date)
+        totals = self.cum_total[j] - self.cum_total[i]
+        counts = self.cum_count[j] - self.cum_count[i]
+        return pd.DataFrame({self.product_column: self.products, self.value_column: totals})[counts > 0]
+
+    def daily_totals(self, start_date, end_date):
+        i, j = self.day_range(start_date, end_date)
+        return pd.Series(self.daily_total[i:j], index=pd.DatetimeIndex(self.days[i:j], name=self.date_column),
+                         name=self.value_column)
+
+    def stats(self, start_date=None, end_date=None, product=None):
+        # 件数・合計・平均・標準偏差・最小・最大（日付省略時は全期間）
+        if start_date is None:
+            i, j = 0, len(self.days)
+        else:
+            i, j = self.day_range(start_date, end_date)
+        columns = slice(None) if product is None else self.product_position(product)
+        count = np.sum(self.cum_count[j, columns] - self.cum_count[i, columns])
+        if count == 0:
+            return None
+        total = np.sum(self.cum_total[j, columns] - self.cum_total[i, columns])
+        squares = np.sum(self.cum_squares[j, columns] - self.cum_squares[i, columns])
+        mean = total / count
+        variance = max(squares - count * mean ** 2, 0.0) / (count - 1) if count > 1 else np.nan
+        return {
+            "count": int(count),
+            "sum": total,
+            "mean": mean,
+            "std": np.sqrt(variance),
+            "min": np.min(self.range_min.query(i, j)[columns]),
+            "max": np.max(self.range_max.query(i, j)[columns]),
+        }
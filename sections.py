@@ -0,0 +1,23 @@
+import streamlit as st
+
+import session_store
+
+
+def lazy_expander(label, key):
+    # エクスパンダーの開閉はサーバーに通知されないので、中にトグルを置いてオンのときだけ中身を計算・送信する。
+    # オンならエクスパンダーを、オフなら None を返す
+    expander = st.expander(label, expanded=st.session_state.get(f"{key}_open", False))
+    if not expander.toggle("内容を表⽰", key=f"{key}_open"):
+        expander.caption("オンにしたときだけ内容を計算します。")
+        return None
+    return expander
+
+
+def cached(name, inputs, compute):
+    # 入力が変わるまで compute() の結果をセッションストアに置いて使い回す
+    store = session_store.get_store()
+    entry = store.get(name)
+    if entry is None or entry[0] != inputs:
+        entry = (inputs, compute())
+        store.set(name, entry)
+    return entry[1]
@@ -0,0 +1,167 @@
+import os
+import pickle
+import shutil
+import sys
+import time
+import weakref
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import cache_layer
+
+
+# 1 セッションあたりのメモリ上限と、ディスクへ退避する条件
+SESSION_BUDGET_BYTES = 50 * 1024 * 1024
+SPILL_VALUE_BYTES = 10 * 1024 * 1024
+SPILL_IDLE_SECONDS = 10 * 60
+SPILL_DIR = os.environ.get(
+    "PORTFOLIO_SPILL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sessions"),
+)
+
+
+def _process_dir(pid=None):
+    # 退避ファイルはプロセスごとのディレクトリに置く（セッション ID はプロセスをまたいで引き継がれない）
+    return os.path.join(SPILL_DIR, str(os.getpid() if pid is None else pid))
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 別のユーザーのプロセスとして動いている
+        pass
+    return True
+
+
+def sweep_orphans():
+    # 終了したプロセスが残した退避ファイルを消す（起動時に 1 回）
+    if not os.path.isdir(SPILL_DIR):
+        return
+    for name in os.listdir(SPILL_DIR):
+        # 数字でない名前は以前の（セッション ID を直接使った）配置のディレクトリ
+        if name.isdigit() and _process_alive(int(name)):
+            continue
+        shutil.rmtree(os.path.join(SPILL_DIR, name), ignore_errors=True)
+
+
+sweep_orphans()
+
+
+class AppendTable:
+    # 行の追加が O(1) の表。列ごとのリストに追記し、DataFrame は表示するときに一度だけ作る
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.data = {column: [] for column in self.columns}
+        self.nbytes = sum(sys.getsizeof(values) for values in self.data.values())
+        self._frame = None
+
+    def append(self, row):
+        for column in self.columns:
+            value = row.get(column)
+            self.data[column].append(value)
+            self.nbytes += sys.getsizeof(value) + 8
+        self._frame = None
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def to_frame(self):
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.data, columns=self.columns)
+        return self._frame
+
+    def __getstate__(self):
+        # 退避するときは作り直せる DataFrame を含めない
+        state = self.__dict__.copy()
+        state["_frame"] = None
+        return state
+
+
+class _Entry:
+    def __init__(self, value):
+        self.value = value
+        self.size = cache_layer.estimate_size(value)
+        self.last_access = time.monotonic()
+        self.spill_path = None
+
+
+class SessionStore:
+    # セッションごとの値をメモリ使用量つきで保持し、大きい値・しばらく使われていない値・
+    # 上限を超えた分（最後に使われたのが古い順）をディスクへ退避する。get で透過的に読み戻す
+    def __init__(self, session_id, budget_bytes=SESSION_BUDGET_BYTES):
+        self.session_id = session_id
+        self.budget_bytes = budget_bytes
+        self.entries = {}
+        self.spills = 0
+        self.reloads = 0
+        self.directory = os.path.join(_process_dir(), session_id)
+        # セッションが終わって SessionStore が破棄されたら（またはプロセスの終了時に）退避ファイルを消す
+        weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+
+    def get(self, name, default=None):
+        entry = self.entries.get(name)
+        if entry is None:
+            return default
+        if entry.spill_path is not None:
+            with open(entry.spill_path, "rb") as f:
+                entry.value = pickle.load(f)
+            os.remove(entry.spill_path)
+            entry.spill_path = None
+            self.reloads += 1
+            entry.last_access = time.monotonic()
+            self.enforce(keep=name)
+        entry.last_access = time.monotonic()
+        return entry.value
+
+    def set(self, name, value):
+        # 値をその場で変更した場合も set し直してサイズを数え直す
+        old = self.entries.get(name)
+        if old is not None and old.spill_path is not None:
+            os.remove(old.spill_path)
+        self.entries[name] = _Entry(value)
+        self.enforce(keep=name)
+
+    def memory_bytes(self):
+        return sum(entry.size for entry in self.entries.values() if entry.spill_path is None)
+
+    def enforce(self, keep=None):
+        now = time.monotonic()
+        resident = [(name, entry) for name, entry in self.entries.items() if entry.spill_path is None]
+        for name, entry in resident:
+            if name != keep and (entry.size > SPILL_VALUE_BYTES or now - entry.last_access > SPILL_IDLE_SECONDS):
+                self._spill(name, entry)
+        for name, entry in sorted(resident, key=lambda item: item[1].last_access):
+            if self.memory_bytes() <= self.budget_bytes:
+                break
+            if name != keep and entry.spill_path is None:
+                self._spill(name, entry)
+
+    def _spill(self, name, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.spills}.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        entry.value = None
+        entry.spill_path = path
+        self.spills += 1
+
+    def stats(self):
+        spilled = [entry for entry in self.entries.values() if entry.spill_path is not None]
+        return {
+            "メモリ使用量(KB)": self.memory_bytes() / 1024,
+            "上限(MB)": self.budget_bytes / 1024 / 1024,
+            "ディスク退避中": len(spilled),
+            "退避回数": self.spills,
+            "読み戻し回数": self.reloads,
+        }
+
+
+def get_store():
+    if "session_store" not in st.session_state:
+        st.session_state.session_store = SessionStore(get_script_run_ctx().session_id)
+    return st.session_state.session_store
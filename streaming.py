@@ -0,0 +1,154 @@
+import io
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import summaries
+
+
+# ライブ売上の取り込み元。PORTFOLIO_LIVE_SALES_FILE を指定するとそのファイル（追記専用の CSV）を読む。
+# 指定がなければデモ用の書き込みを DEMO_FILE に行い、それを読む。デモ用ファイルは起動のたびに作り直すので、
+# 複数のプロセスが互いのファイルを消さないようプロセスごとに分ける
+LIVE_SALES_FILE = os.environ.get("PORTFOLIO_LIVE_SALES_FILE")
+DEMO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "live", f"sales-{os.getpid()}.csv")
+DEMO_ROWS_PER_SECOND = 2
+# デモ用ファイルがこれを超えたら空にして書き直す（読む側は先頭から読み直す）
+DEMO_MAX_BYTES = 10 * 1024 * 1024
+# グラフに使う直近の行数と、ライブ表示の更新間隔（秒）
+RING_CAPACITY = 1000
+REFRESH_SECONDS = 2
+LIVE_COLUMNS = ["⽇時", "商品", "売上"]
+
+
+class RingBuffer:
+    # 直近 capacity 行だけを列ごとの固定長配列に保持する。追記は新しい行の分だけ書き込む
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.columns = None
+        self.end = 0
+        self.total = 0
+
+    def extend(self, frame):
+        if self.columns is None:
+            self.columns = {column: np.empty(self.capacity, dtype=frame[column].to_numpy().dtype)
+                            for column in frame.columns}
+        frame = frame.iloc[-self.capacity:]
+        positions = (self.end + np.arange(len(frame))) % self.capacity
+        for column, values in self.columns.items():
+            values[positions] = frame[column].to_numpy()
+        self.end = (self.end + len(frame)) % self.capacity
+        self.total += len(frame)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def to_frame(self):
+        # 古い順に並べた DataFrame（コピー）を返す
+        if self.columns is None:
+            return pd.DataFrame()
+        order = (self.end - len(self) + np.arange(len(self))) % self.capacity
+        return pd.DataFrame({column: values[order] for column, values in self.columns.items()})
+
+
+class FileTailSource:
+    # 追記専用の CSV（ヘッダーなし）を、前回読んだ位置から末尾まで読む。書きかけの最後の行は次回に回す
+    def __init__(self, path, columns=LIVE_COLUMNS):
+        self.path = path
+        self.columns = list(columns)
+        self.offset = 0
+        self.pending = b""
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=self.columns)
+        if os.path.getsize(self.path) < self.offset:
+            # ファイルが作り直されたら先頭から読み直す
+            self.offset, self.pending = 0, b""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        complete, _, self.pending = (self.pending + data).rpartition(b"\n")
+        if not complete:
+            return pd.DataFrame(columns=self.columns)
+        return pd.read_csv(io.BytesIO(complete), names=self.columns, header=None, parse_dates=[self.columns[0]])
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class DemoWriter:
+    # デモ用: 前回からの経過時間に応じた件数の売上行をファイルへ追記する（外部のシステムの代わり）
+    def __init__(self, path, products=("A", "B", "C"), rows_per_second=DEMO_ROWS_PER_SECOND, seed=20):
+        self.path = path
+        self.products = list(products)
+        self.rows_per_second = rows_per_second
+        self.generator = np.random.default_rng(seed)
+        self.last_write = time.time() - 60
+        # デモのデータは起動のたびに作り直し、プロセスの終了時に消す
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+        weakref.finalize(self, _remove_file, path)
+
+    def __call__(self):
+        now = time.time()
+        rows = min(int((now - self.last_write) * self.rows_per_second), RING_CAPACITY)
+        if rows <= 0:
+            return
+        times = pd.to_datetime(np.linspace(self.last_write, now, rows), unit="s").floor("s")
+        self.last_write = now
+        products = self.generator.choice(self.products, rows)
+        amounts = self.generator.integers(1000, 5000, rows)
+        mode = "w" if os.path.exists(self.path) and os.path.getsize(self.path) > DEMO_MAX_BYTES else "a"
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.writelines(f"{t:%Y-%m-%d %H:%M:%S},{p},{a}\n" for t, p, a in zip(times, products, amounts))
+
+
+class LiveFeed:
+    # ソースから取り込んだ行をリングバッファに追記し、全期間の集計は新しい行の分だけ更新する。
+    # 全セッションで共有するのでロックで保護する
+    def __init__(self, source, producer=None, capacity=RING_CAPACITY, value_column="売上", group_column="商品"):
+        self.source = source
+        self.producer = producer
+        self.value_column = value_column
+        self.group_column = group_column
+        self.lock = threading.Lock()
+        self.buffer = RingBuffer(capacity)
+        self.summary = summaries.ColumnSummary()
+        self.group_totals = {}
+
+    def refresh(self):
+        # 新しく取り込んだ行数を返す
+        with self.lock:
+            if self.producer is not None:
+                self.producer()
+            rows = self.source.poll()
+            if rows.empty:
+                return 0
+            self.buffer.extend(rows)
+            self.summary.update(rows[self.value_column].to_numpy(dtype=float))
+            for group, total in rows.groupby(self.group_column)[self.value_column].sum().items():
+                self.group_totals[group] = self.group_totals.get(group, 0) + total
+            return len(rows)
+
+    def snapshot(self):
+        # (直近の行, 全期間の統計, グループ別の合計)
+        with self.lock:
+            stats = {"count": self.summary.count, "sum": self.summary.sum,
+                     "mean": self.summary.mean, "min": self.summary.min, "max": self.summary.max}
+            totals = pd.Series(self.group_totals, name=self.value_column, dtype=float).sort_index()
+            return self.buffer.to_frame(), stats, totals
+
+
+def sales_feed():
+    if LIVE_SALES_FILE:
+        return LiveFeed(FileTailSource(LIVE_SALES_FILE))
+    return LiveFeed(FileTailSource(DEMO_FILE), producer=DemoWriter(DEMO_FILE))
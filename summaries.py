@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+
+# 分位点スケッチが保持する代表点の数。これ以下の件数なら分位点は厳密値と一致する
+SKETCH_CAPACITY = 1024
+# from_frame が一度に要約する行数
+FRAME_CHUNK_ROWS = 65536
+DESCRIBE_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+class QuantileSketch:
+    # 重み付きの代表点で分布を近似する併合可能なスケッチ。代表点が capacity を超えたら、
+    # 累積重みを capacity 等分した区間ごとに隣り合う点を重み付き平均でまとめる
+    def __init__(self, capacity=SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.values = np.zeros(0)
+        self.weights = np.zeros(0)
+
+    def update(self, values):
+        self._absorb(values, np.ones(len(values)))
+
+    def merge(self, other):
+        self._absorb(other.values, other.weights)
+
+    def _absorb(self, values, weights):
+        values = np.concatenate([self.values, values])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(values, kind="stable")
+        values, weights = values[order], weights[order]
+        if len(values) > self.capacity:
+            cumulative = np.cumsum(weights)
+            bins = ((cumulative - weights / 2) / cumulative[-1] * self.capacity).astype(int)
+            starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+            merged = np.add.reduceat(weights, starts)
+            values = np.add.reduceat(values * weights, starts) / merged
+            weights = merged
+        self.values, self.weights = values, weights
+
+    def quantile(self, q):
+        # 重み w の代表点は順位 (累積重み - w) から w 個分を占めるとみなし、pandas と同じ線形補間をする
+        if not len(self.values):
+            return np.nan
+        cumulative = np.cumsum(self.weights)
+        positions = cumulative - (self.weights + 1) / 2
+        return float(np.interp(q * (cumulative[-1] - 1), positions, self.values))
+
+
+class ColumnSummary:
+    # 1 列分の件数・平均・偏差平方和・最小・最大と分位点スケッチ。update で行を足し、merge で要約同士を併合する
+    def __init__(self, capacity=SKETCH_CAPACITY):
+        self.count = 0
+        self.mean = self.m2 = 0.0
+        self.min, self.max = np.inf, -np.inf
+        self.sketch = QuantileSketch(capacity)
+
+    @classmethod
+    def from_values(cls, values, capacity=SKETCH_CAPACITY):
+        summary = cls(capacity)
+        summary.update(values)
+        return summary
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            mean = values.mean()
+            self._combine(len(values), mean, np.square(values - mean).sum(), values.min(), values.max())
+            self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+            self.sketch.merge(other.sketch)
+        return self
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        # Chan らの並列アルゴリズムで平均と偏差平方和を併合する
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    @property
+    def sum(self):
+        return self.mean * self.count
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+    def describe(self, name=None):
+        # Series.describe() と同じ形式で返す
+        if not self.count:
+            return pd.Series([0.0] + [np.nan] * 7, index=DESCRIBE_INDEX, name=name)
+        return pd.Series([float(self.count), self.mean, self.std, self.min,
+                          self.sketch.quantile(0.25), self.sketch.quantile(0.5), self.sketch.quantile(0.75),
+                          self.max], index=DESCRIBE_INDEX, name=name)
+
+
+class FrameSummary:
+    # DataFrame の数値列ごとの ColumnSummary。チャンクを読むたびに update する
+    def __init__(self, capacity=SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.columns = None
+
+    @classmethod
+    def from_frame(cls, df, chunk_rows=FRAME_CHUNK_ROWS, capacity=SKETCH_CAPACITY):
+        summary = cls(capacity)
+        for start in range(0, max(len(df), 1), chunk_rows):
+            summary.update(df.iloc[start:start + chunk_rows])
+        return summary
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = {column: ColumnSummary(self.capacity)
+                            for column in chunk.select_dtypes(include=[np.number]).columns}
+        for column, summary in self.columns.items():
+            summary.update(pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan))
+        return self
+
+    def merge(self, other):
+        # 片方にしかない列は、もう片方では値がなかったものとして併合する
+        if self.columns is None:
+            self.columns = {}
+        for column, summary in (other.columns or {}).items():
+            self.columns.setdefault(column, ColumnSummary(self.capacity)).merge(summary)
+        return self
+
+    @property
+    def numeric_columns(self):
+        return list(self.columns or {})
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def describe(self):
+        # DataFrame.describe() と同じ形式で返す
+        if not self.columns:
+            return pd.DataFrame()
+        return pd.DataFrame({column: summary.describe() for column, summary in self.columns.items()})
+
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import sections
+
+
+PAGE_SIZES = (50, 100, 500, 1000)
+
+
+def _sort_order(df, key, token, column, ascending):
+    # token（呼び出し側が渡すデータの内容を表す値）があれば並べ替え順をセッションストアに覚えておき、
+    # ページ移動のたびにソートし直さない。token がなければ毎回ソートする
+    def compute():
+        order = df[column].argsort(kind="stable").to_numpy()
+        return order if ascending else order[::-1]
+    if token is None:
+        return compute()
+    return sections.cached(f"{key}_sort_order", (token, len(df), column, ascending), compute)
+
+
+def _filter_mask(df, column, text):
+    values = df[column]
+    if pd.api.types.is_numeric_dtype(values):
+        number = pd.to_numeric(text, errors="coerce")
+        return (values == number).to_numpy() if not pd.isna(number) else np.zeros(len(df), dtype=bool)
+    return values.astype("string").str.contains(text, regex=False, na=False).to_numpy()
+
+
+def paged_dataframe(df, key, token=None, page_size=100):
+    # 表示中のページの行だけをフロントエンドへ送る。並べ替えと絞り込みはサーバー側で行う。
+    # token は df の内容が変わったときだけ変わる値（日付範囲やアップロードのハッシュなど）
+    if len(df) <= page_size:
+        st.dataframe(df)
+        return
+    columns = df.columns.tolist()
+    sort_col, order_col, filter_col, text_col = st.columns([2, 1, 2, 2])
+    sort_column = sort_col.selectbox("並べ替え", [None] + columns, key=f"{key}_sort",
+                                     format_func=lambda c: "（なし）" if c is None else str(c))
+    ascending = order_col.radio("順序", ["昇順", "降順"], key=f"{key}_order", horizontal=True) == "昇順"
+    filter_column = filter_col.selectbox("絞り込む列", columns, key=f"{key}_filter_column")
+    filter_text = text_col.text_input("含む値", key=f"{key}_filter_text")
+
+    positions = np.arange(len(df)) if sort_column is None else _sort_order(df, key, token, sort_column, ascending)
+    if filter_text:
+        positions = positions[_filter_mask(df, filter_column, filter_text)[positions]]
+
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    page_size = size_col.selectbox("表示件数", PAGE_SIZES, index=PAGE_SIZES.index(page_size)
+                                   if page_size in PAGE_SIZES else 0, key=f"{key}_page_size")
+    pages = max(1, -(-len(positions) // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        # 絞り込みで行数が減ったときは最後のページに合わせる
+        st.session_state[f"{key}_page"] = pages
+    page = page_col.number_input("ページ", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    window = positions[start:start + page_size]
+    info_col.caption(f"全 {len(df):,} ⾏（絞り込み後 {len(positions):,} ⾏）中 "
+                     f"{start + 1 if len(window) else 0:,}〜{start + len(window):,} ⾏⽬を表⽰")
+    st.dataframe(df.iloc[window])
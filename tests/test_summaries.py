@@ -0,0 +1,18 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import summaries
+
+
+def test_frame_summary_merge_with_disjoint_columns():
+    left = summaries.FrameSummary.from_frame(pd.DataFrame({"x": np.arange(10.0)}))
+    right = summaries.FrameSummary.from_frame(pd.DataFrame({"y": np.arange(5.0)}))
+    merged = left.merge(right).describe()
+    assert merged.loc["count", "x"] == 10
+    assert merged.loc["count", "y"] == 5
+    assert merged.loc["max", "y"] == 4
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uploads
+
+
+def test_histogram_late_outlier_stays_within_max_bins():
+    histogram = uploads.StreamingHistogram()
+    histogram.update(np.linspace(0, 1, 1000))
+    histogram.update(np.array([2e6]))
+    centers, counts, width = histogram.bins()
+    assert len(counts) <= histogram.max_bins
+    assert counts.sum() == 1001
+    assert centers[-1] - width / 2 <= 2e6 < centers[-1] + width / 2
+
+
+def test_histogram_constant_first_chunk_then_outlier():
+    histogram = uploads.StreamingHistogram()
+    histogram.update(np.full(1000, 3.0))
+    histogram.update(np.array([5e9]))
+    centers, counts, width = histogram.bins()
+    assert len(counts) <= histogram.max_bins
+    assert counts.sum() == 1001
+    assert counts[0] == 1000 and counts[-1] == 1
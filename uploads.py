@@ -0,0 +1,183 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+import summaries
+
+
+# この件数を超えるファイルはチャンク単位で読み込む
+STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+CHUNK_ROWS = 50000
+SAMPLE_ROWS = 20000
+HISTOGRAM_MAX_BINS = 100
+UPLOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def _load_workbook(uploaded_file, **kwargs):
+    # openpyxl は import に時間がかかるので、Excel がアップロードされたときに初めて読み込む
+    import openpyxl
+    return openpyxl.load_workbook(uploaded_file, read_only=True, **kwargs)
+
+
+def excel_sheet_names(uploaded_file):
+    # read_only で開けばシート名の取得にシート全体を読み込む必要がない
+    workbook = _load_workbook(uploaded_file)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+        uploaded_file.seek(0)
+
+
+def iter_csv_chunks(uploaded_file, chunk_rows=CHUNK_ROWS):
+    uploaded_file.seek(0)
+    for chunk in pd.read_csv(uploaded_file, chunksize=chunk_rows):
+        yield chunk, uploaded_file.tell()
+
+
+def iter_excel_chunks(uploaded_file, sheet_name, chunk_rows=CHUNK_ROWS):
+    # openpyxl の read_only モードで行を順番に読み、chunk_rows ごとに DataFrame にする
+    uploaded_file.seek(0)
+    workbook = _load_workbook(uploaded_file, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+        buffer = []
+        read_rows = 0
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunk_rows:
+                read_rows += len(buffer)
+                yield pd.DataFrame(buffer, columns=columns), read_rows
+                buffer = []
+        if buffer:
+            read_rows += len(buffer)
+            yield pd.DataFrame(buffer, columns=columns), read_rows
+    finally:
+        workbook.close()
+
+
+def excel_row_count(uploaded_file, sheet_name):
+    # read_only モードではシートの dimension から行数の見積もりが取れる（取れない場合は None）
+    uploaded_file.seek(0)
+    workbook = _load_workbook(uploaded_file)
+    try:
+        max_row = workbook[sheet_name].max_row
+        return None if max_row is None else max(max_row - 1, 0)
+    finally:
+        workbook.close()
+        uploaded_file.seek(0)
+
+
+class StreamingHistogram:
+    # 幅 width の固定ビン（k*width 〜 (k+1)*width）を数え、ビン数が上限を超えたら隣同士を併合する
+    def __init__(self, max_bins=HISTOGRAM_MAX_BINS):
+        self.max_bins = max_bins
+        self.width = None
+        self.start = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, values):
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        low_value, high_value = values.min(), values.max()
+        if self.width is None:
+            value_range = high_value - low_value
+            self.width = value_range / (self.max_bins // 2) if value_range > 0 else 1.0
+        if len(self.counts):
+            low_value = min(low_value, self.start * self.width)
+            high_value = max(high_value, (self.start + len(self.counts) - 1) * self.width)
+        # 後から外れ値が来ても確保する配列が max_bins を超えないよう、先に幅を何回倍にするか決めてから併合する
+        factor = 1
+        while np.floor(high_value / (self.width * factor)) - np.floor(low_value / (self.width * factor)) + 1 > self.max_bins:
+            factor *= 2
+        if factor > 1:
+            self._coarsen(factor)
+        bins = np.floor(values / self.width).astype(np.int64)
+        low = min(bins.min(), self.start) if len(self.counts) else bins.min()
+        high = max(bins.max(), self.start + len(self.counts) - 1) if len(self.counts) else bins.max()
+        counts = np.zeros(high - low + 1, dtype=np.int64)
+        counts[self.start - low:self.start - low + len(self.counts)] += self.counts
+        np.add.at(counts, bins - low, 1)
+        self.start, self.counts = low, counts
+        while len(self.counts) > self.max_bins:
+            self._coarsen(2)
+
+    def _coarsen(self, factor):
+        # 幅を factor 倍（2 のべき）にして、隣り合う factor 個のビンを 1 つにまとめる
+        merged_start = self.start // factor
+        merged = np.zeros((self.start + len(self.counts) - 1) // factor - merged_start + 1, dtype=np.int64)
+        np.add.at(merged, np.arange(self.start, self.start + len(self.counts)) // factor - merged_start, self.counts)
+        self.start, self.counts, self.width = merged_start, merged, self.width * factor
+
+    def bins(self):
+        # (ビン中心, 度数, ビン幅) を返す
+        if self.width is None:
+            return np.zeros(0), np.zeros(0, dtype=np.int64), 1.0
+        centers = (np.arange(self.start, self.start + len(self.counts)) + 0.5) * self.width
+        return centers, self.counts, self.width
+
+
+class StreamingSummary:
+    # チャンクごとに列の要約（件数・モーメント・最小・最大・分位点スケッチ）を併合し、表示用に行のサンプルを保持する
+    def __init__(self, sample_rows=SAMPLE_ROWS, seed=0):
+        self.sample_rows = sample_rows
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.stats = summaries.FrameSummary()
+        self.histograms = {}
+        self.sample = None
+        self.sample_keys = np.zeros(0)
+
+    @property
+    def numeric_columns(self):
+        return self.stats.numeric_columns
+
+    @property
+    def nbytes(self):
+        # キャッシュの上限の判定に使うおおよそのサイズ（サンプル・ヒストグラム・分位点スケッチ）
+        sample_bytes = 0 if self.sample is None else int(self.sample.memory_usage(deep=True).sum())
+        histogram_bytes = sum(h.counts.nbytes for h in self.histograms.values())
+        sketch_bytes = sum(column.sketch.values.nbytes * 2 for column in (self.stats.columns or {}).values())
+        return sample_bytes + self.sample_keys.nbytes + histogram_bytes + sketch_bytes
+
+    def update(self, chunk):
+        self.stats.update(chunk)
+        for column in self.numeric_columns:
+            values = pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            self.histograms.setdefault(column, StreamingHistogram()).update(values)
+        self._update_sample(chunk)
+        self.rows += len(chunk)
+
+    def _update_sample(self, chunk):
+        # 各行に一様乱数のキーを振り、キーが小さい sample_rows 行を残す（ボトム k サンプリング）
+        keys = self.rng.random(len(chunk))
+        if self.sample is None:
+            sample, sample_keys = chunk, keys
+        else:
+            sample = pd.concat([self.sample, chunk], ignore_index=True)
+            sample_keys = np.concatenate([self.sample_keys, keys])
+        if len(sample) > self.sample_rows:
+            keep = np.sort(np.argpartition(sample_keys, self.sample_rows)[:self.sample_rows])
+            sample, sample_keys = sample.iloc[keep], sample_keys[keep]
+        self.sample = sample.reset_index(drop=True)
+        self.sample_keys = sample_keys
+
+    def describe(self):
+        # DataFrame.describe() と同じ形式で返す（分位点のみスケッチからの推定値）
+        return self.stats.describe()
+
+
+def content_digest(uploaded_file):
+    # ファイル名ではなく内容のハッシュをキャッシュキーにする
+    digest = hashlib.sha256()
+    with uploaded_file.getbuffer() as view:
+        for offset in range(0, len(view), 1024 * 1024):
+            digest.update(view[offset:offset + 1024 * 1024])
+    return digest.hexdigest()
+
@@ -0,0 +1,101 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+
+# 起動直後の最初のアクセスで重い読み込みを待たせないよう、st.cache_resource / st.cache_data の
+# 関数を最初のスクリプト実行と並行してバックグラウンドで呼んでおく。PORTFOLIO_WARMUP=0 で無効になる。
+# `python warmup.py` はアプリを一度ヘッドレスで実行してディスクキャッシュを作り、起動時間を表示する
+ENABLED = os.environ.get("PORTFOLIO_WARMUP", "1") != "0"
+THREAD_NAME = "portfolio-warmup"
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+_lock = threading.Lock()
+_tasks = []
+_report = {}
+_thread = None
+
+
+class _WarmupThreadFilter(logging.Filter):
+    # ウォームアップのスレッドはどのセッションにも属さないので、キャッシュ関数が出す
+    # 「missing ScriptRunContext」の警告はこのスレッドの分だけ捨てる
+    def filter(self, record):
+        return record.threadName != THREAD_NAME
+
+
+logging.getLogger("streamlit.runtime.scriptrunner.script_run_context").addFilter(_WarmupThreadFilter())
+
+
+def record(name, seconds):
+    # プロセスで最初の 1 回だけ記録する（2 回目以降の再実行はキャッシュ済みなので数えない）
+    with _lock:
+        _report.setdefault(name, {"状態": "完了", "時間(秒)": seconds})
+
+
+def register(name, func):
+    # 再実行のたびに呼ばれても、最初に登録した関数だけを使う（キャッシュのキーは同じ）
+    with _lock:
+        if all(registered != name for registered, _ in _tasks):
+            _tasks.append((name, func))
+
+
+def _run(tasks):
+    for name, func in tasks:
+        with _lock:
+            _report[name] = {"状態": "実行中", "時間(秒)": None}
+        start_time = time.perf_counter()
+        try:
+            func()
+            state = "完了（ウォームアップ）"
+        except Exception as error:
+            # 失敗してもセクションを実行したときに改めて計算される
+            state = f"失敗: {error}"
+        with _lock:
+            _report[name] = {"状態": state, "時間(秒)": time.perf_counter() - start_time}
+
+
+def start():
+    # プロセスで最初の 1 回だけ、登録済みの関数をバックグラウンドのスレッドで呼ぶ
+    global _thread
+    with _lock:
+        if _thread is not None or not ENABLED:
+            return
+        _thread = threading.Thread(target=_run, args=(list(_tasks),), name=THREAD_NAME, daemon=True)
+    _thread.start()
+
+
+def report():
+    with _lock:
+        return {name: dict(entry) for name, entry in _report.items()}
+
+
+def main():
+    # コンテナの起動時などに実行しておくと、ディスクキャッシュ（.cache）が作られ、
+    # サーバーの最初のアクセスではメモリマップで開くだけになる
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    from streamlit.testing.v1 import AppTest
+
+    start_time = time.perf_counter()
+    at = AppTest.from_file(APP_PATH, default_timeout=600).run()
+    elapsed = time.perf_counter() - start_time
+    if at.exception:
+        for exception in at.exception:
+            print(exception.value, file=sys.stderr)
+        return 1
+    # アプリが読み込んだ warmup はこのファイル（__main__）とは別のモジュールとして登録されている
+    app_warmup = sys.modules["warmup"]
+    if app_warmup._thread is not None:
+        app_warmup._thread.join()
+    print(f"{'初回のスクリプト実行':<30} {elapsed:8.3f}s")
+    for name, entry in app_warmup.report().items():
+        seconds = "" if entry["時間(秒)"] is None else f"{entry['時間(秒)']:8.3f}s"
+        print(f"{name:<30} {seconds:>9}  {entry['状態']}")
+    for name, timing in at.session_state["section_timings"].items():
+        print(f"{name:<30} {timing['実行時間(秒)']:8.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())